@@ -7,39 +7,37 @@
 
 import os
 import sys
-import subprocess
 import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import result_cache
+import ffmpeg_utils
+
 try:
-    from aliyun_transcription import AliyunTranscription
+    from aliyun_transcription import AliyunTranscription, json_loads
 except ImportError:
     print("❌ 错误: 需要安装阿里云SDK")
     print("运行: pip install aliyun-python-sdk-core oss2")
     sys.exit(1)
 
 
+# 批量处理目录时识别的视频格式
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.mkv', '.avi', '.flv', '.wmv', '.webm', '.m4v')
+
+
 def extract_audio(video_path, audio_path):
-    """从视频中提取音频为MP3格式（高质量设置）"""
+    """从视频中提取音频为FLAC格式（无损，16kHz单声道）"""
     print("  提取音频...")
     print(f"  开始时间: {time.strftime('%H:%M:%S')}")
     print(f"  输入文件: {video_path}")
     print(f"  输出文件: {audio_path}")
 
     start_time = time.time()
-    cmd = [
-        'ffmpeg', '-i', video_path,
-        '-vn', '-acodec', 'libmp3lame',
-        '-ar', '16000',  # 阿里云要求8000-48000Hz，16000是语音识别的标准采样率
-        '-ac', '1',      # 单声道（语音识别推荐）
-        '-b:a', '128k',  # 提高比特率到128k，保留更多音频细节
-        '-q:a', '2',     # MP3质量等级（0-9，2为高质量）
-        audio_path, '-y'
-    ]
     print("  正在执行FFmpeg音频提取...")
-    result = subprocess.run(cmd, capture_output=True)
-    if result.returncode != 0:
-        raise Exception(f"FFmpeg提取音频失败: {result.stderr.decode()}")
+    ffmpeg_utils.extract_audio(video_path, audio_path)
 
     elapsed = time.time() - start_time
     audio_size = os.path.getsize(audio_path) / 1024 / 1024
@@ -47,33 +45,17 @@ def extract_audio(video_path, audio_path):
     print(f"  音频文件大小: {audio_size:.2f} MB")
 
 
-def get_audio_duration(audio_path):
-    """获取音频文件时长（秒）"""
-    try:
-        cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-               '-of', 'default=noprint_wrappers=1:nokey=1', audio_path]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-        if result.returncode == 0:
-            return float(result.stdout.strip())
-    except Exception:
-        pass
-    return None
-
-
 def parse_result_to_srt(result_json, srt_path):
     """将阿里云识别结果转换为SRT字幕格式"""
     print("  生成SRT字幕文件...")
     print(f"  开始时间: {time.strftime('%H:%M:%S')}")
     start_time = time.time()
 
-    import json
     # 解析JSON结果（兼容不同的数据类型）
     if isinstance(result_json, dict):
         result = result_json
-    elif isinstance(result_json, str):
-        result = json.loads(result_json)
-    elif isinstance(result_json, bytes):
-        result = json.loads(result_json.decode('utf-8'))
+    elif isinstance(result_json, (str, bytes)):
+        result = json_loads(result_json)
     else:
         raise TypeError(f"不支持的结果类型: {type(result_json)}")
 
@@ -84,26 +66,14 @@ def parse_result_to_srt(result_json, srt_path):
 
     print(f"  识别到 {len(sentences)} 条字幕")
 
+    # 一次性拼接整个SRT内容后写入，避免每条字幕多次调用write（时间戳单位为毫秒）
+    srt_text = "".join([
+        f"{i}\n{format_timestamp(s['BeginTime'])} --> {format_timestamp(s['EndTime'])}\n{s['Text']}\n\n"
+        for i, s in enumerate(sentences, 1)
+    ])
+
     with open(srt_path, 'w', encoding='utf-8') as f:
-        for i, sentence in enumerate(sentences, 1):
-            # 获取时间戳（单位：毫秒）
-            begin_time = sentence['BeginTime'] / 1000  # 转换为秒
-            end_time = sentence['EndTime'] / 1000
-            text = sentence['Text']
-
-            # 格式化时间戳
-            start = format_timestamp(begin_time)
-            end = format_timestamp(end_time)
-
-            # 写入SRT格式
-            f.write(f"{i}\n")
-            f.write(f"{start} --> {end}\n")
-            f.write(f"{text}\n\n")
-
-            # 每处理100条字幕显示一次进度
-            if i % 100 == 0:
-                progress = i / len(sentences) * 100
-                print(f"    写入进度: {i}/{len(sentences)} ({progress:.1f}%)")
+        f.write(srt_text)
 
     elapsed = time.time() - start_time
     srt_size = os.path.getsize(srt_path) / 1024
@@ -111,13 +81,16 @@ def parse_result_to_srt(result_json, srt_path):
     print(f"  文件大小: {srt_size:.2f} KB，耗时: {elapsed:.2f}秒")
 
 
-def format_timestamp(seconds):
-    """格式化时间戳为SRT格式"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int((seconds % 1) * 1000)
-    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+# SRT时间戳格式（预先取出format方法，每条字幕调用两次，不必每次重新解析格式）
+_format_srt_time = "{:02d}:{:02d}:{:02d},{:03d}".format
+
+
+def format_timestamp(milliseconds):
+    """格式化时间戳为SRT格式（输入为毫秒，全程整数运算，避免浮点取余的舍入误差）"""
+    secs, millis = divmod(round(milliseconds), 1000)
+    minutes, secs = divmod(secs, 60)
+    hours, minutes = divmod(minutes, 60)
+    return _format_srt_time(hours, minutes, secs, millis)
 
 
 def add_subtitle_to_video(video_path, srt_path, output_path):
@@ -130,32 +103,11 @@ def add_subtitle_to_video(video_path, srt_path, output_path):
 
     start_time = time.time()
 
-    # 确保使用绝对路径
-    srt_path_abs = os.path.abspath(srt_path)
-
-    # Windows路径转义：需要转义反斜杠和冒号
-    if sys.platform.startswith('win'):
-        # Windows: 先将反斜杠转为正斜杠，然后转义冒号
-        # 使用 filename= 参数来明确指定文件路径
-        srt_path_escaped = srt_path_abs.replace('\\', '/').replace(':', r'\:')
-        filter_str = f"subtitles=filename='{srt_path_escaped}'"
-    else:
-        # Unix: 转义冒号
-        srt_path_escaped = srt_path_abs.replace(':', r'\:')
-        filter_str = f"subtitles='{srt_path_escaped}'"
-
+    hw_encoder = ffmpeg_utils.detect_hw_encoder()
+    print(f"  视频编码器: {hw_encoder[0] if hw_encoder else 'libx264（软件编码）'}")
     print("  正在执行FFmpeg字幕烧录...")
     print("  (这个过程可能需要较长时间，请耐心等待)")
-
-    cmd = [
-        'ffmpeg', '-i', video_path,
-        '-vf', filter_str,
-        '-c:a', 'copy',
-        output_path, '-y'
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise Exception(f"FFmpeg烧录字幕失败: {result.stderr}")
+    ffmpeg_utils.add_subtitle_to_video(video_path, srt_path, output_path)
 
     elapsed = time.time() - start_time
     output_size = os.path.getsize(output_path) / 1024 / 1024
@@ -163,6 +115,193 @@ def add_subtitle_to_video(video_path, srt_path, output_path):
     print(f"  输出文件大小: {output_size:.2f} MB")
 
 
+def mux_subtitle_to_video(video_path, srt_path, output_path, language='zh'):
+    """将字幕作为独立字幕轨封装到视频中（软字幕）"""
+    print("\n  将字幕封装为字幕轨...")
+    print(f"  开始时间: {time.strftime('%H:%M:%S')}")
+    print(f"  输入视频: {video_path}")
+    print(f"  字幕文件: {srt_path}")
+    print(f"  输出视频: {output_path}")
+
+    start_time = time.time()
+    ffmpeg_utils.mux_subtitle_to_video(video_path, srt_path, output_path, language)
+
+    elapsed = time.time() - start_time
+    output_size = os.path.getsize(output_path) / 1024 / 1024
+    print(f"  ✓ 字幕封装完成，耗时: {elapsed:.2f}秒")
+    print(f"  输出文件大小: {output_size:.2f} MB")
+
+
+def transcribe_with_aliyun(transcription, video_path, file_hash, key):
+    """使用阿里云识别：检查OSS上的识别结果和音频，上传音频，提交任务并等待结果"""
+    # 其他机器已识别过同一视频时，直接读取保存在OSS上的结果
+    result_json = transcription.load_transcript(key)
+    if result_json is not None:
+        print("  ✓ OSS上已有该视频的识别结果，跳过提取、上传和识别")
+        return result_json
+
+    # 步骤1: 生成固定的OSS对象名称（基于视频文件哈希）
+    print("[1/6] 检查云端是否已有音频文件...")
+    object_name = transcription.get_audio_object_name(video_path, file_hash)
+    print(f"  OSS对象名称: {object_name}")
+
+    # 步骤2: 检查OSS是否已存在，避免重复提取和上传
+    if transcription.bucket.object_exists(object_name):
+        print("  ✓ 音频文件已存在于OSS，跳过提取和上传")
+        # 获取时长（用于动态设置超时），直接读取视频文件信息
+        audio_duration = ffmpeg_utils.get_audio_duration(video_path)
+    else:
+        # 步骤3: 提取音频并同时上传到OSS，时长从提取过程中得到
+        print("[2/6] 提取音频...")
+        print("[3/6] 上传音频到OSS（边提取边上传）...")
+        print(f"  开始时间: {time.strftime('%H:%M:%S')}")
+        audio_duration = ffmpeg_utils.stream_audio_to_oss(transcription, video_path, object_name)
+    file_url = transcription.bucket.sign_url('GET', object_name, 3600)
+
+    print(f"  文件URL: {file_url[:80]}...")
+
+    # 步骤4: 提交识别任务并等待完成
+    print("\n[4/6] 提交语音识别任务...")
+    result_json = transcription.transcribe_file(file_url, audio_duration)
+    transcription.save_transcript(key, result_json)
+    return result_json
+
+
+def transcribe_with_whisper(transcription, video_path, audio_path):
+    """使用本地Whisper识别（无需上传OSS和轮询云端任务）"""
+    from whisper_transcription import load_audio, SAMPLE_RATE
+
+    print("[1/6] 使用本地识别引擎，跳过OSS上传")
+
+    if transcription.use_whisper_cpp:
+        # whisper.cpp命令行需要读取音频文件
+        print("[2/6] 提取音频...")
+        extract_audio(video_path, audio_path)
+        audio = audio_path
+        audio_duration = ffmpeg_utils.get_audio_duration(audio_path)
+    else:
+        # 解码后的PCM直接通过管道读入内存，不写临时音频文件
+        print("[2/6] 解码音频...")
+        audio = load_audio(video_path)
+        audio_duration = len(audio) / SAMPLE_RATE
+        print(f"  ✓ 音频解码完成，时长: {audio_duration:.1f}秒")
+
+    print("\n[3/6] 加载Whisper模型...")
+    transcription.load_model()
+
+    print("\n[4/6] 本地语音识别...")
+    return transcription.transcribe_file(audio, audio_duration)
+
+
+def collect_videos(paths):
+    """展开命令行中的视频文件和目录（目录只扫描第一层）"""
+    videos = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            videos.extend(sorted(f for f in path.iterdir() if f.suffix.lower() in VIDEO_EXTENSIONS))
+        else:
+            videos.append(path)
+    return videos
+
+
+def format_elapsed(total_elapsed):
+    """格式化总耗时"""
+    hours = int(total_elapsed // 3600)
+    minutes = int((total_elapsed % 3600) // 60)
+    seconds = int(total_elapsed % 60)
+    if hours > 0:
+        return f"{hours}小时{minutes}分钟{seconds}秒"
+    elif minutes > 0:
+        return f"{minutes}分钟{seconds}秒"
+    return f"{seconds}秒"
+
+
+def finish_video(video_path, srt_path, output_path, output_dir, total_start_time, language, burn_in):
+    """步骤6: 烧录或封装字幕并输出结果（在后台线程中执行，与下一个视频的识别并行）"""
+    if burn_in:
+        print("\n[6/6] 将字幕烧录到视频...")
+        add_subtitle_to_video(video_path, srt_path, output_path)
+    else:
+        print("\n[6/6] 将字幕封装到视频...")
+        mux_subtitle_to_video(video_path, srt_path, output_path, language)
+
+    print("\n" + "=" * 60)
+    print("✓ 处理完成！")
+    print("=" * 60)
+    print(f"输出目录: {output_dir}")
+    print(f"输出视频: {output_path}")
+    print(f"字幕文件: {srt_path}")
+    print(f"完成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"总耗时: {format_elapsed(time.time() - total_start_time)}")
+    print("=" * 60 + "\n")
+
+
+def process_video(video_path, transcription, backend, language, burn_pool, burn_in=False):
+    """
+    处理单个视频：识别、生成字幕，然后把烧录/封装任务提交到后台线程池
+
+    Returns:
+        future: 烧录任务
+    """
+    # 设置输出路径 - 在视频文件的同名目录下
+    video_path_obj = Path(video_path).resolve()
+    video_path = str(video_path_obj)
+    base_name = video_path_obj.stem
+    video_dir = video_path_obj.parent
+
+    # 创建与视频文件同名的输出目录
+    output_dir = video_dir / base_name
+    output_dir.mkdir(exist_ok=True)
+
+    # 在输出目录下创建文件（中间音频放在临时目录）
+    lang_suffix = "en" if language == "en" else "zh"
+    srt_path = str(output_dir / f"{base_name}_{lang_suffix}.srt")
+    output_path = str(output_dir / f"{base_name}_字幕版.mp4")
+
+    print("\n" + "=" * 60)
+    print("开始处理视频...")
+    print("=" * 60)
+    print(f"输入视频: {video_path}")
+    print(f"识别语言: {'英语 (English)' if language == 'en' else '中文 (Chinese)'}")
+    print(f"识别引擎: {'本地Whisper' if backend == 'whisper' else '阿里云'}")
+    print(f"字幕方式: {'烧录硬字幕' if burn_in else '软字幕（字幕轨）'}")
+    print(f"输出目录: {output_dir}")
+    print(f"输出视频: {output_path}")
+    print(f"字幕文件: {srt_path}")
+    print(f"开始时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 60 + "\n")
+
+    total_start_time = time.time()
+
+    print("检查识别结果缓存...")
+    file_hash = result_cache.get_file_hash(video_path)
+    model_name = transcription.model_name if backend == 'whisper' else None
+    key = result_cache.cache_key(file_hash, backend, language, model_name)
+    result_json = result_cache.load_result(key)
+    if result_json is not None:
+        print("  ✓ 已有该视频的识别结果，跳过提取、上传和识别\n")
+    else:
+        if backend == 'whisper':
+            # 中间音频（仅whisper.cpp需要）写在临时目录中，无论成功还是出错，退出时都会自动删除
+            with tempfile.TemporaryDirectory() as temp_dir:
+                audio_path = os.path.join(temp_dir, f"{base_name}_audio.flac")
+                result_json = transcribe_with_whisper(transcription, video_path, audio_path)
+        else:
+            result_json = transcribe_with_aliyun(transcription, video_path, file_hash, key)
+        # 保存识别结果，下次处理同一视频时直接使用
+        result_cache.save_result(key, result_json)
+
+    # 步骤5: 生成SRT字幕文件
+    print("\n[5/6] 生成SRT字幕文件...")
+    parse_result_to_srt(result_json, srt_path)
+
+    # 可选：清理OSS文件（默认不清理，方便重复使用）
+    # transcription.cleanup_oss_file(object_name)
+
+    # 步骤6: 烧录/封装字幕（后台执行，主线程继续识别下一个视频）
+    return burn_pool.submit(finish_video, video_path, srt_path, output_path, output_dir,
+                            total_start_time, language, burn_in)
 
 
 def main():
@@ -171,22 +310,38 @@ def main():
         print("视频字幕工具 - 使用阿里云语音识别服务")
         print("=" * 60)
         print("\n用法:")
-        print("  python add_chinese_subtitle.py <视频文件路径> [语言]\n")
+        print("  python add_chinese_subtitle.py <视频文件或目录> [更多视频...] [语言] [--burn-in]\n")
         print("示例:")
         print("  python add_chinese_subtitle.py video.mp4         # 中文识别（默认）")
         print("  python add_chinese_subtitle.py video.mp4 zh      # 中文识别")
-        print("  python add_chinese_subtitle.py video.mp4 en      # 英语识别\n")
+        print("  python add_chinese_subtitle.py video.mp4 en      # 英语识别")
+        print("  python add_chinese_subtitle.py a.mp4 b.mp4 en    # 批量处理多个视频")
+        print("  python add_chinese_subtitle.py videos/           # 批量处理目录下所有视频")
+        print("  python add_chinese_subtitle.py video.mp4 --burn-in  # 烧录硬字幕（重新编码，较慢）\n")
+        print("默认以软字幕（mov_text字幕轨）封装，不重新编码视频；需要硬字幕时使用 --burn-in\n")
         print("环境变量配置:")
         print("  ALIBABA_ACCESS_KEY_ID      - 阿里云AccessKey ID")
         print("  ALIBABA_ACCESS_KEY_SECRET  - 阿里云AccessKey Secret")
         print("  ALIBABA_APP_KEY            - 语音识别应用AppKey")
         print("  ALIBABA_OSS_BUCKET         - OSS存储桶名称")
         print("  ALIBABA_REGION             - 地域（可选，默认: cn-shanghai）")
+        print("  ASR_BACKEND                - 识别引擎（可选，aliyun/whisper，默认: aliyun）")
+        print("  WHISPER_MODEL              - 本地Whisper模型（可选，默认: base；.bin/.gguf使用whisper.cpp）")
+        print("  WHISPER_COMPUTE_TYPE       - 本地识别精度（可选，默认: GPU float16 / CPU int8）")
+        print("  SUBTITLE_PRESET            - 烧录字幕的x264编码预设（可选，默认: veryfast）")
         print("=" * 60)
         sys.exit(1)
 
-    video_path = sys.argv[1]
-    language = sys.argv[2] if len(sys.argv) > 2 else 'zh'  # 默认中文
+    args = sys.argv[1:]
+    # 字幕方式：默认软字幕（--soft-subs），--burn-in 烧录硬字幕
+    burn_in = False
+    for flag in ('--burn-in', '--soft-subs'):
+        while flag in args:
+            args.remove(flag)
+            burn_in = flag == '--burn-in'
+    language = 'zh'  # 默认中文
+    if len(args) > 1 and not os.path.exists(args[-1]):
+        language = args.pop()
 
     # 验证语言参数
     if language not in ['zh', 'en']:
@@ -194,8 +349,19 @@ def main():
         sys.exit(1)
 
     # 验证视频文件
-    if not os.path.exists(video_path):
-        print(f"❌ 错误: 找不到视频文件 {video_path}")
+    videos = collect_videos(args)
+    for video_path in videos:
+        if not video_path.exists():
+            print(f"❌ 错误: 找不到视频文件 {video_path}")
+            sys.exit(1)
+    if not videos:
+        print("❌ 错误: 没有找到需要处理的视频文件")
+        sys.exit(1)
+
+    # 识别引擎：aliyun（云端，默认）或 whisper（本地，无需OSS）
+    backend = os.getenv('ASR_BACKEND', 'aliyun')
+    if backend not in ['aliyun', 'whisper']:
+        print(f"❌ 错误: 不支持的识别引擎 '{backend}'，请使用 'aliyun' 或 'whisper'")
         sys.exit(1)
 
     # 读取配置
@@ -205,7 +371,7 @@ def main():
     bucket_name = os.getenv('ALIBABA_OSS_BUCKET')
     region = os.getenv('ALIBABA_REGION', 'cn-shanghai')
 
-    # 验证配置
+    # 验证配置（本地识别不需要阿里云配置）
     missing_configs = []
     if not access_key_id:
         missing_configs.append('ALIBABA_ACCESS_KEY_ID')
@@ -216,7 +382,7 @@ def main():
     if not bucket_name:
         missing_configs.append('ALIBABA_OSS_BUCKET')
 
-    if missing_configs:
+    if backend == 'aliyun' and missing_configs:
         print(f"❌ 错误: 缺少必要的环境变量配置:")
         for config in missing_configs:
             print(f"   - {config}")
@@ -227,36 +393,18 @@ def main():
         print("  export ALIBABA_OSS_BUCKET='your_bucket_name'")
         sys.exit(1)
 
-    # 设置输出路径 - 在视频文件的同名目录下
-    video_path_obj = Path(video_path).resolve()
-    base_name = video_path_obj.stem
-    video_dir = video_path_obj.parent
-
-    # 创建与视频文件同名的输出目录
-    output_dir = video_dir / base_name
-    output_dir.mkdir(exist_ok=True)
-
-    # 在输出目录下创建文件
-    audio_path = str(output_dir / f"{base_name}_audio.mp3")
-    lang_suffix = "en" if language == "en" else "zh"
-    srt_path = str(output_dir / f"{base_name}_{lang_suffix}.srt")
-    output_path = str(output_dir / f"{base_name}_字幕版.mp4")
-
-    print("\n" + "=" * 60)
-    print("开始处理视频...")
-    print("=" * 60)
-    print(f"输入视频: {video_path}")
-    print(f"识别语言: {'英语 (English)' if language == 'en' else '中文 (Chinese)'}")
-    print(f"输出目录: {output_dir}")
-    print(f"输出视频: {output_path}")
-    print(f"字幕文件: {srt_path}")
-    print(f"开始时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
-    print("=" * 60 + "\n")
-
-    total_start_time = time.time()
-
-    try:
-        # 创建阿里云语音识别客户端
+    # 创建识别客户端（批量处理时所有视频共用，模型/连接只初始化一次）
+    if backend == 'whisper':
+        from whisper_transcription import WhisperTranscription
+        try:
+            transcription = WhisperTranscription(
+                model_name=os.getenv('WHISPER_MODEL', 'base'),
+                language=language
+            )
+        except Exception as e:
+            print(f"❌ 错误: {str(e)}")
+            sys.exit(1)
+    else:
         transcription = AliyunTranscription(
             access_key_id=access_key_id,
             access_key_secret=access_key_secret,
@@ -266,75 +414,37 @@ def main():
             language=language
         )
 
-        # 步骤1: 生成固定的OSS对象名称（基于视频文件哈希）
-        print("[1/6] 检查云端是否已有音频文件...")
-        object_name = transcription.get_audio_object_name(video_path)
-        print(f"  OSS对象名称: {object_name}")
-
-        # 步骤2: 检查OSS是否已存在，避免重复提取和上传
-        audio_duration = None
-        if transcription.bucket.object_exists(object_name):
-            print("  ✓ 音频文件已存在于OSS，跳过提取和上传")
-            # 直接生成访问URL
-            file_url = transcription.bucket.sign_url('GET', object_name, 3600)
-        else:
-            print("[2/6] 提取音频...")
-            # 提取音频
-            extract_audio(video_path, audio_path)
-            # 获取音频时长（用于动态设置超时）
-            audio_duration = get_audio_duration(audio_path)
-
-            # 步骤3: 上传到OSS
-            print("\n[3/6] 上传音频到OSS...")
-            transcription.bucket.put_object_from_file(object_name, audio_path)
-            print(f"  ✓ 音频文件已上传: {object_name}")
-            file_url = transcription.bucket.sign_url('GET', object_name, 3600)
-
-        print(f"  文件URL: {file_url[:80]}...")
-
-        # 步骤4: 提交识别任务并等待完成
-        print("\n[4/6] 提交语音识别任务...")
-        result_json = transcription.transcribe_file(file_url, audio_duration)
-
-        # 步骤5: 生成SRT字幕文件
-        print("\n[5/6] 生成SRT字幕文件...")
-        parse_result_to_srt(result_json, srt_path)
-
-        # 步骤6: 将字幕烧录到视频
-        print("\n[6/6] 将字幕烧录到视频...")
-        add_subtitle_to_video(video_path, srt_path, output_path)
-
-        # 清理临时文件
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
-            print("\n✓ 临时音频文件已清理")
-
-        # 可选：清理OSS文件（默认不清理，方便重复使用）
-        # transcription.cleanup_oss_file(object_name)
-
-        # 计算总耗时
-        total_elapsed = time.time() - total_start_time
-        hours = int(total_elapsed // 3600)
-        minutes = int((total_elapsed % 3600) // 60)
-        seconds = int(total_elapsed % 60)
-
-        print("\n" + "=" * 60)
-        print("✓ 处理完成！")
-        print("=" * 60)
-        print(f"输出目录: {output_dir}")
-        print(f"输出视频: {output_path}")
-        print(f"字幕文件: {srt_path}")
-        print(f"完成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
-        if hours > 0:
-            print(f"总耗时: {hours}小时{minutes}分钟{seconds}秒")
-        elif minutes > 0:
-            print(f"总耗时: {minutes}分钟{seconds}秒")
-        else:
-            print(f"总耗时: {seconds}秒")
-        print("=" * 60 + "\n")
-
-    except Exception as e:
-        print(f"\n❌ 处理失败: {str(e)}")
+    if len(videos) > 1:
+        print(f"\n共 {len(videos)} 个视频待处理")
+
+    # 识别在主线程串行执行（共用客户端/模型），字幕烧录/封装交给后台线程并行执行
+    # FFmpeg是独立进程，线程只负责等待；每个编码进程自身也会使用多线程，因此并发数取CPU核数的一半
+    if burn_in:
+        # 识别期间在后台检测硬件编码器，第一个视频开始烧录时不用再等待检测
+        threading.Thread(target=ffmpeg_utils.detect_hw_encoder, daemon=True).start()
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) // 2)) as burn_pool:
+        jobs = []
+        for video_path in videos:
+            try:
+                jobs.append((video_path, process_video(video_path, transcription, backend, language, burn_pool, burn_in)))
+            except Exception as e:
+                print(f"\n❌ 处理失败: {video_path}: {str(e)}")
+                failed.append(video_path)
+
+        for video_path, future in jobs:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"\n❌ 处理失败: {video_path}: {str(e)}")
+                failed.append(video_path)
+
+    if failed:
+        if len(videos) > 1:
+            print(f"\n{len(failed)}/{len(videos)} 个视频处理失败:")
+            for video_path in failed:
+                print(f"   - {video_path}")
         sys.exit(1)
 
 
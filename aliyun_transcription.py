@@ -4,10 +4,13 @@
 按照官方最佳实践实现
 https://help.aliyun.com/document_detail/90727.html
 """
-import json
 import time
-import hashlib
 import os
+import random
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from aliyunsdkcore.acs_exception.exceptions import ClientException
 from aliyunsdkcore.acs_exception.exceptions import ServerException
@@ -15,6 +18,20 @@ from aliyunsdkcore.client import AcsClient
 from aliyunsdkcore.request import CommonRequest
 import oss2
 
+import result_cache
+from result_cache import json_loads, json_dumps
+
+# 分片并发上传时每个线程各占一个连接，连接池需大于上传线程数
+oss2.defaults.connection_pool_size = 16
+
+try:
+    # 上传时oss2用crcmod逐字节计算CRC64校验；crcmod没有C扩展时（Windows上常见）是纯Python实现，
+    # 会明显拖慢上传，这时关闭CRC校验（HTTPS本身已保证传输完整性）
+    import crcmod._crcfunext  # noqa: F401
+    OSS_ENABLE_CRC = True
+except ImportError:
+    OSS_ENABLE_CRC = False
+
 
 class AliyunTranscription:
     """阿里云语音识别服务封装"""
@@ -45,6 +62,11 @@ class AliyunTranscription:
     STATUS_RUNNING = "RUNNING"
     STATUS_QUEUEING = "QUEUEING"
 
+    # OSS分片上传参数：超过1MB的文件按1MB分片，8个线程并发上传
+    MULTIPART_THRESHOLD = 1024 * 1024
+    PART_SIZE = 1024 * 1024
+    UPLOAD_THREADS = 8
+
     def __init__(self, access_key_id, access_key_secret, app_key, bucket_name, region="cn-shanghai", language="zh"):
         """
         初始化阿里云语音识别客户端
@@ -74,47 +96,155 @@ class AliyunTranscription:
         # 创建OSS客户端
         auth = oss2.Auth(access_key_id, access_key_secret)
         endpoint = f'https://oss-{region}.aliyuncs.com'
-        self.bucket = oss2.Bucket(auth, endpoint, bucket_name)
+        self.bucket = oss2.Bucket(auth, endpoint, bucket_name, enable_crc=OSS_ENABLE_CRC)
 
     def get_file_hash(self, file_path):
         """
-        计算文件的MD5哈希值
+        计算文件指纹（文件大小 + 抽样内容的MD5）
         用于生成唯一的文件标识
         """
-        start_time = time.time()
-        file_size = os.path.getsize(file_path)
-        print(f"  正在计算文件哈希值... (文件大小: {file_size / 1024 / 1024:.2f} MB)")
-
-        hasher = hashlib.md5()
-        processed = 0
-        with open(file_path, 'rb') as f:
-            # 分块读取，避免大文件占用过多内存
-            for chunk in iter(lambda: f.read(4096), b""):
-                hasher.update(chunk)
-                processed += len(chunk)
-                # 每处理10MB显示一次进度
-                if processed % (10 * 1024 * 1024) == 0:
-                    progress = processed / file_size * 100
-                    print(f"    进度: {progress:.1f}% ({processed / 1024 / 1024:.2f}/{file_size / 1024 / 1024:.2f} MB)")
-
-        elapsed = time.time() - start_time
-        print(f"  ✓ 哈希计算完成，耗时: {elapsed:.2f}秒")
-        return hasher.hexdigest()
+        return result_cache.get_file_hash(file_path)
 
-    def get_audio_object_name(self, video_path):
+    def get_audio_object_name(self, video_path, file_hash=None):
         """
         根据视频文件生成固定的音频对象名称
-        使用视频文件的MD5哈希确保唯一性
+        使用视频文件的指纹确保唯一性
+
+        Args:
+            video_path: 视频文件路径
+            file_hash: 已计算好的视频哈希（可选，避免重复计算）
         """
         # 计算视频文件的哈希
-        file_hash = self.get_file_hash(video_path)
-        # 获取文件扩展名
-        ext = Path(video_path).suffix
-        # 生成对象名称：audio/hash_原始文件名.mp3
+        if file_hash is None:
+            file_hash = self.get_file_hash(video_path)
+        # 生成对象名称：audio/hash_原始文件名.flac
         base_name = Path(video_path).stem
-        object_name = f"audio/{file_hash}_{base_name}.mp3"
+        object_name = f"audio/{file_hash}_{base_name}.flac"
         return object_name
 
+    def upload_file(self, audio_path, object_name):
+        """
+        分片并发上传文件到OSS（断点续传，中断后重新上传会跳过已完成的分片）
+
+        Args:
+            audio_path: 本地音频文件路径
+            object_name: OSS对象名称
+        """
+        start_time = time.time()
+        file_size = os.path.getsize(audio_path)
+        print(f"  正在上传音频文件... (大小: {file_size / 1024 / 1024:.2f} MB)")
+        try:
+            oss2.resumable_upload(
+                self.bucket, object_name, audio_path,
+                store=oss2.ResumableStore(root=tempfile.gettempdir()),
+                multipart_threshold=self.MULTIPART_THRESHOLD,
+                part_size=self.PART_SIZE,
+                num_threads=self.UPLOAD_THREADS
+            )
+        except oss2.exceptions.RequestError:
+            # 连接类错误（DNS/网络不通）才做诊断
+            self.diagnose_network()
+            raise
+        elapsed = time.time() - start_time
+        print(f"  ✓ 音频文件已上传: {object_name}，耗时: {elapsed:.2f}秒")
+
+    def upload_stream(self, stream, object_name, on_eof=None, copy_to=None):
+        """
+        从数据流（如FFmpeg管道输出）分片上传到OSS，不需要先写本地文件
+        读取数据和上传分片并行进行：读到一个分片就交给上传线程，继续读取下一个分片
+
+        Args:
+            stream: 可读的二进制数据流
+            object_name: OSS对象名称
+            on_eof: 数据读完、合并分片之前调用的检查函数（抛出异常则放弃本次上传）
+            copy_to: 同时写入读取数据的本地文件（可选，用于边上传边保存）
+
+        Returns:
+            上传的字节数
+        """
+        start_time = time.time()
+        upload_id = self.bucket.init_multipart_upload(object_name).upload_id
+        # 限制已读取但未上传完的分片数量，上传比读取慢时不会无限占用内存
+        slots = threading.BoundedSemaphore(self.UPLOAD_THREADS * 2)
+
+        def upload_part(part_number, chunk):
+            try:
+                result = self.bucket.upload_part(object_name, upload_id, part_number, chunk)
+                return oss2.models.PartInfo(part_number, result.etag, size=len(chunk))
+            finally:
+                slots.release()
+
+        futures = []
+        total_size = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.UPLOAD_THREADS) as pool:
+                while True:
+                    chunk = stream.read(self.PART_SIZE)
+                    if not chunk:
+                        break
+                    if copy_to is not None:
+                        copy_to.write(chunk)
+                    slots.acquire()
+                    futures.append(pool.submit(upload_part, len(futures) + 1, chunk))
+                    total_size += len(chunk)
+                    print(f"    已读取: {total_size / 1024 / 1024:.2f} MB", end='\r')
+                    # 已有分片上传失败时不再继续读取
+                    if any(f.done() and f.exception() for f in futures):
+                        break
+                parts = [f.result() for f in futures]
+
+            if on_eof:
+                on_eof()
+            if not parts:
+                raise Exception("没有读取到需要上传的数据")
+            self.bucket.complete_multipart_upload(object_name, upload_id, parts)
+        except Exception as e:
+            # 放弃未完成的分片上传，避免残留碎片占用存储空间
+            self.bucket.abort_multipart_upload(object_name, upload_id)
+            if isinstance(e, oss2.exceptions.RequestError):
+                self.diagnose_network()
+            raise
+
+        elapsed = time.time() - start_time
+        print(f"\n  ✓ 音频文件已上传: {object_name}（{total_size / 1024 / 1024:.2f} MB），耗时: {elapsed:.2f}秒")
+        return total_size
+
+    def load_transcript(self, key):
+        """
+        读取保存在OSS上的识别结果（transcripts/缓存键.json）
+        本地缓存未命中时使用，换一台机器或清空本地缓存后也不需要重新识别
+
+        Args:
+            key: 缓存键（与本地结果缓存相同）
+
+        Returns:
+            识别结果（dict），没有保存过时返回None
+        """
+        try:
+            return json_loads(self.bucket.get_object(f"transcripts/{key}.json").read())
+        except oss2.exceptions.NoSuchKey:
+            return None
+        except (oss2.exceptions.OssError, ValueError) as e:
+            print(f"  ⚠ 读取云端识别结果失败: {str(e)}")
+            return None
+
+    def save_transcript(self, key, result):
+        """
+        把识别结果保存到OSS（transcripts/缓存键.json），保存失败不影响主流程
+
+        Args:
+            key: 缓存键（与本地结果缓存相同）
+            result: 识别结果（dict或JSON字符串）
+        """
+        if isinstance(result, dict):
+            result = json_dumps(result)
+        if isinstance(result, str):
+            result = result.encode('utf-8')
+        try:
+            self.bucket.put_object(f"transcripts/{key}.json", result)
+        except oss2.exceptions.OssError as e:
+            print(f"  ⚠ 保存云端识别结果失败: {str(e)}")
+
     def upload_audio_to_oss(self, audio_path, object_name):
         """
         上传音频文件到OSS
@@ -126,23 +256,31 @@ class AliyunTranscription:
         Returns:
             file_url: 带签名的临时访问URL
         """
-        start_time = time.time()
         # 检查文件是否已存在
         if self.bucket.object_exists(object_name):
             print(f"  音频文件已存在于OSS，跳过上传: {object_name}")
         else:
-            # 上传文件
-            file_size = os.path.getsize(audio_path)
-            print(f"  正在上传音频文件... (大小: {file_size / 1024 / 1024:.2f} MB)")
-            self.bucket.put_object_from_file(object_name, audio_path)
-            elapsed = time.time() - start_time
-            print(f"  ✓ 音频文件已上传: {object_name}，耗时: {elapsed:.2f}秒")
+            self.upload_file(audio_path, object_name)
 
         # 生成带签名的临时访问URL（有效期1小时）
         # 使用签名URL可以让语音识别服务访问私有OSS文件
         file_url = self.bucket.sign_url('GET', object_name, 3600)
         return file_url
 
+    def diagnose_network(self):
+        """
+        网络诊断：检查语音识别和OSS服务域名能否解析
+        只在请求因网络问题失败时调用，正常流程不做任何探测
+        """
+        print("  正在诊断网络连接...")
+        oss_host = f"oss-{self.region}.aliyuncs.com"
+        for name, host in (("语音识别服务", self.DOMAIN), ("OSS服务", oss_host)):
+            try:
+                ip = socket.gethostbyname(host)
+                print(f"    ✓ {name} {host} → {ip}")
+            except socket.gaierror as e:
+                print(f"    ❌ {name} {host} 域名解析失败: {e}，请检查网络或DNS设置")
+
     def submit_task(self, file_url):
         """
         提交录音文件识别请求（按照官方示例 + 高级参数优化）
@@ -186,7 +324,7 @@ class AliyunTranscription:
             # 中文识别（默认）
             print("  语言设置: 中文 (默认)")
 
-        task_json = json.dumps(task)
+        task_json = json_dumps(task).decode('utf-8')
         print(f"  提交任务参数: {task_json}")
         postRequest.add_body_params(self.KEY_TASK, task_json)
 
@@ -195,10 +333,8 @@ class AliyunTranscription:
             print("  正在提交到阿里云服务器...")
             postResponse = self.client.do_action_with_exception(postRequest)
             # 处理不同类型的响应（兼容不同SDK版本）
-            if isinstance(postResponse, bytes):
-                postResponse = json.loads(postResponse.decode('utf-8'))
-            elif isinstance(postResponse, str):
-                postResponse = json.loads(postResponse)
+            if isinstance(postResponse, (bytes, str)):
+                postResponse = json_loads(postResponse)
             # 如果已经是dict，直接使用
             print(f"  服务器响应: {postResponse}")
 
@@ -214,23 +350,26 @@ class AliyunTranscription:
         except ServerException as e:
             raise Exception(f"服务器错误: {e}")
         except ClientException as e:
+            if e.get_error_code() == 'SDK.HttpError':
+                self.diagnose_network()
             raise Exception(f"客户端错误: {e}")
 
-    def get_task_result(self, task_id, max_wait_time=300, poll_interval=10):
+    def get_task_result(self, task_id, max_wait_time=300, poll_interval=10, initial_delay=0.5):
         """
-        查询识别任务结果（按照官方示例的轮询方式）
+        查询识别任务结果（轮询间隔从initial_delay开始按1.5倍递增，并加入少量随机抖动）
 
         Args:
             task_id: 任务ID
             max_wait_time: 最大等待时间（秒）
-            poll_interval: 轮询间隔（秒）
+            poll_interval: 最大轮询间隔（秒）
+            initial_delay: 提交后首次查询前的等待时间（秒）
 
         Returns:
             result: 识别结果JSON字符串
         """
         print(f"\n  开始等待识别结果... (任务ID: {task_id})")
         print(f"  最大等待时间: {max_wait_time}秒 ({max_wait_time / 60:.1f}分钟)")
-        print(f"  轮询间隔: {poll_interval}秒")
+        print(f"  轮询间隔: {initial_delay}秒起递增，最长{poll_interval}秒")
         print(f"  开始时间: {time.strftime('%H:%M:%S')}\n")
 
         # 创建GET请求
@@ -248,6 +387,11 @@ class AliyunTranscription:
         start_time = time.time()
         statusText = ""
         poll_count = 0
+        delay = initial_delay
+
+        # 任务刚提交时不可能已经完成，先等待initial_delay再首次查询
+        time.sleep(delay)
+        delay = min(delay * 1.5, poll_interval)
 
         while True:
             # 检查是否超时
@@ -259,10 +403,8 @@ class AliyunTranscription:
                 poll_count += 1
                 getResponse = self.client.do_action_with_exception(getRequest)
                 # 处理不同类型的响应（兼容不同SDK版本）
-                if isinstance(getResponse, bytes):
-                    getResponse = json.loads(getResponse.decode('utf-8'))
-                elif isinstance(getResponse, str):
-                    getResponse = json.loads(getResponse)
+                if isinstance(getResponse, (bytes, str)):
+                    getResponse = json_loads(getResponse)
                 # 如果已经是dict，直接使用
 
                 statusText = getResponse.get(self.KEY_STATUS_TEXT)
@@ -272,17 +414,20 @@ class AliyunTranscription:
                     progress_percent = (elapsed_time / max_wait_time) * 100
                     status_text = "排队中" if statusText == self.STATUS_QUEUEING else "识别中"
                     print(f"  [{time.strftime('%H:%M:%S')}] 第{poll_count}次查询 - 状态: {status_text} | 已等待: {int(elapsed_time)}秒 / {max_wait_time}秒 ({progress_percent:.1f}%)")
-                    time.sleep(poll_interval)
+                    time.sleep(delay + random.uniform(0, 0.2))
+                    delay = min(delay * 1.5, poll_interval)
                 else:
                     # 退出轮询
                     break
 
             except ServerException as e:
-                print(f"  [{time.strftime('%H:%M:%S')}] 服务器错误: {e}，将在{poll_interval}秒后重试...")
-                time.sleep(poll_interval)
+                print(f"  [{time.strftime('%H:%M:%S')}] 服务器错误: {e}，将在{delay:.1f}秒后重试...")
+                time.sleep(delay)
+                delay = min(delay * 1.5, poll_interval)
             except ClientException as e:
-                print(f"  [{time.strftime('%H:%M:%S')}] 客户端错误: {e}，将在{poll_interval}秒后重试...")
-                time.sleep(poll_interval)
+                print(f"  [{time.strftime('%H:%M:%S')}] 客户端错误: {e}，将在{delay:.1f}秒后重试...")
+                time.sleep(delay)
+                delay = min(delay * 1.5, poll_interval)
 
         # 检查最终状态
         total_elapsed = time.time() - start_time
@@ -317,7 +462,10 @@ class AliyunTranscription:
             max_wait_time = 600  # 默认10分钟
             print(f"  未获取音频时长，使用默认超时: {max_wait_time}秒")
 
-        result = self.get_task_result(task_id, max_wait_time=max_wait_time, poll_interval=10)
+        # 短音频（30秒以内）通常几秒内完成，0.5秒后即开始查询；长音频不可能很快完成，4秒后才首次查询，减少无效查询
+        initial_delay = 0.5 if not audio_duration or audio_duration < 30 else 4
+        result = self.get_task_result(task_id, max_wait_time=max_wait_time, poll_interval=10,
+                                      initial_delay=initial_delay)
         return result
 
     def cleanup_oss_file(self, object_name):
@@ -43,9 +43,10 @@ if torch.cuda.is_available():
     print("GPU 加速测试")
     print("=" * 60)
     try:
-        # 创建一个测试张量并移到GPU
-        test_tensor = torch.randn(1000, 1000).cuda()
-        result = test_tensor @ test_tensor
+        major, minor = torch.cuda.get_device_capability(0)
+        print(f"✓ 计算能力: {major}.{minor}")
+        # 最小的GPU运算，确认CUDA内核可以正常执行
+        torch.zeros(1, device='cuda').add_(1).item()
         print("✓ GPU 加速功能正常！")
     except Exception as e:
         print(f"❌ GPU 测试失败: {e}")
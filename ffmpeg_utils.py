@@ -0,0 +1,325 @@
+# -*- coding: utf8 -*-
+"""
+FFmpeg相关工具（命令行和Web界面共用）
+提取音频（边提取边上传到OSS）、读取时长、烧录字幕、封装字幕轨
+"""
+import os
+import re
+import sys
+import shutil
+import subprocess
+import tempfile
+import threading
+
+
+# FFmpeg只输出错误信息（不打印版本信息和进度），也不读取标准输入
+FFMPEG_QUIET = ['-hide_banner', '-loglevel', 'error', '-nostats', '-nostdin']
+
+# FFmpeg程序路径在启动时查找一次，之后每次调用不再搜索PATH（未找到时仍按命令名调用，由系统报错）
+FFMPEG = shutil.which("ffmpeg") or "ffmpeg"
+FFPROBE = shutil.which("ffprobe") or "ffprobe"
+
+# Windows下启动子进程时不创建控制台窗口
+SUBPROCESS_FLAGS = {'creationflags': subprocess.CREATE_NO_WINDOW} if sys.platform.startswith('win') else {}
+
+
+def build_extract_audio_cmd(video_path, audio_path):
+    """生成提取音频的FFmpeg命令（FLAC无损压缩，编码几乎不占CPU）"""
+    return [
+        FFMPEG, *FFMPEG_QUIET, '-i', video_path,
+        '-vn', '-acodec', 'flac',
+        '-ar', '16000',  # 阿里云要求8000-48000Hz，16000是语音识别的标准采样率
+        '-ac', '1',      # 单声道（语音识别推荐）
+        '-sample_fmt', 's16',  # 16位采样，语音识别无需更高位深
+        '-f', 'flac',    # 明确指定格式，支持输出到管道
+        audio_path, '-y'
+    ]
+
+
+def extract_audio(video_path, audio_path):
+    """从视频中提取音频为FLAC格式（无损，16kHz单声道）"""
+    # 先写临时文件，提取成功后才改为正式文件名，失败时不会留下不完整的音频被下次复用
+    partial_path = audio_path + '.part'
+    cmd = build_extract_audio_cmd(video_path, partial_path)
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, **SUBPROCESS_FLAGS)
+    if result.returncode != 0:
+        try:
+            os.remove(partial_path)
+        except FileNotFoundError:
+            pass
+        raise Exception(f"FFmpeg提取音频失败: {result.stderr.decode(errors='replace')}")
+    os.replace(partial_path, audio_path)
+
+
+def get_flac_duration(audio_path):
+    """
+    从FLAC文件头（STREAMINFO）读取时长，不需要启动ffprobe进程
+
+    Returns:
+        时长（秒），不是FLAC文件或文件头中没有总采样数时返回None
+    """
+    try:
+        with open(audio_path, 'rb') as f:
+            header = f.read(26)
+    except OSError:
+        return None
+    # "fLaC" + 4字节块头 + STREAMINFO前10字节，之后的8字节依次为：采样率(20位)、声道数、位深、总采样数(36位)
+    if len(header) < 26 or header[:4] != b'fLaC':
+        return None
+    info = int.from_bytes(header[18:26], 'big')
+    sample_rate = info >> 44
+    total_samples = info & ((1 << 36) - 1)
+    if not sample_rate or not total_samples:
+        return None
+    return total_samples / sample_rate
+
+
+def get_audio_duration(audio_path):
+    """获取音视频文件时长（秒）"""
+    # 本程序提取的FLAC音频直接读取文件头
+    duration = get_flac_duration(audio_path)
+    if duration is not None:
+        return duration
+    try:
+        cmd = [FFPROBE, '-v', 'error', '-show_entries', 'format=duration',
+               '-of', 'default=noprint_wrappers=1:nokey=1', audio_path]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10, **SUBPROCESS_FLAGS)
+        if result.returncode == 0:
+            return float(result.stdout.strip())
+    except Exception:
+        pass
+    return None
+
+
+# FFmpeg -progress 输出的进度行（key=value）
+PROGRESS_LINE_RE = re.compile(r'^\w+=\S*$')
+
+
+def parse_progress_duration(progress_output):
+    """
+    从FFmpeg -progress 输出中读取已处理的时长（最后一个 out_time_us）
+
+    Returns:
+        时长（秒），没有有效进度信息时返回None
+    """
+    for line in reversed(progress_output.splitlines()):
+        if line.startswith('out_time_us='):
+            value = line.split('=', 1)[1].strip()
+            if value.isdigit():
+                return int(value) / 1000000
+    return None
+
+
+def stream_audio_to_oss(transcription, video_path, object_name, audio_path=None):
+    """
+    边提取边上传：FFmpeg输出的音频通过管道直接分片上传到OSS
+    FFmpeg出错时放弃上传，避免把不完整的音频留在OSS上被后续复用
+
+    Args:
+        transcription: AliyunTranscription实例
+        video_path: 视频文件路径
+        object_name: OSS对象名称
+        audio_path: 同时保存到本地的音频文件路径（默认不写本地文件）
+
+    Returns:
+        音频时长（秒），从同一次FFmpeg的进度输出中读取，不再单独调用ffprobe
+    """
+    # -progress 把进度（含已输出时长）写到stderr，和错误信息一起保存在临时文件
+    cmd = build_extract_audio_cmd(video_path, 'pipe:1')
+    cmd[1:1] = ['-progress', 'pipe:2']
+    # 本地音频先写临时文件，上传成功后才改为正式文件名，失败时不会留下不完整的音频被下次复用
+    partial_path = audio_path + '.part' if audio_path else None
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, bufsize=1 << 20,
+                                **SUBPROCESS_FLAGS)
+
+        def read_stderr():
+            stderr_file.seek(0)
+            return stderr_file.read().decode(errors='replace')
+
+        def check_ffmpeg():
+            if proc.wait() != 0:
+                # 去掉进度行（key=value），只保留错误信息
+                errors = "\n".join(line for line in read_stderr().splitlines()
+                                   if not PROGRESS_LINE_RE.match(line))
+                raise Exception(f"FFmpeg提取音频失败: {errors}")
+
+        try:
+            if partial_path is None:
+                transcription.upload_stream(proc.stdout, object_name, on_eof=check_ffmpeg)
+            else:
+                with open(partial_path, 'wb') as audio_file:
+                    transcription.upload_stream(proc.stdout, object_name, on_eof=check_ffmpeg,
+                                                copy_to=audio_file)
+                os.replace(partial_path, audio_path)
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+            if partial_path is not None:
+                try:
+                    os.remove(partial_path)
+                except FileNotFoundError:
+                    pass
+
+        return parse_progress_duration(read_stderr())
+
+
+# 软件编码(libx264)预设：越快文件越大，可通过环境变量 SUBTITLE_PRESET 调整（如 faster、medium）
+SUBTITLE_PRESET = os.getenv("SUBTITLE_PRESET", "veryfast")
+SOFTWARE_ENCODER = ['-c:v', 'libx264', '-preset', SUBTITLE_PRESET, '-crf', '23']
+
+# 字幕烧录可用的硬件编码器（按优先级排列）及其码率/质量参数
+HW_ENCODERS = [
+    ('h264_nvenc', ['-preset', 'p4', '-cq', '23']),        # NVIDIA
+    ('h264_qsv', ['-global_quality', '23']),               # Intel Quick Sync
+    ('h264_videotoolbox', ['-b:v', '8M']),                 # macOS
+]
+
+# 把MP4索引（moov）移到文件开头，浏览器下载/播放时无需等待整个文件
+FASTSTART = ['-movflags', '+faststart']
+
+# subtitles滤镜的路径转义表（一次替换完成）：冒号前加反斜杠；Windows下反斜杠先转为正斜杠
+if sys.platform.startswith('win'):
+    SUBTITLE_PATH_ESCAPE = str.maketrans({'\\': '/', ':': r'\:'})
+else:
+    SUBTITLE_PATH_ESCAPE = str.maketrans({':': r'\:'})
+
+# 使用硬件编码器时同时尝试硬件解码（不支持时FFmpeg自动使用软件解码）
+HW_DECODE = ['-hwaccel', 'auto']
+
+# 硬件编码器检测结果（None=未检测，False=无可用硬件编码器）
+_hw_encoder = None
+_hw_encoder_lock = threading.Lock()
+
+
+def detect_hw_encoder():
+    """
+    检测可用的硬件视频编码器，结果缓存在模块变量中，只检测一次
+
+    Returns:
+        (encoder, options) 或 None（使用软件编码 libx264）
+    """
+    global _hw_encoder
+    # 多个烧录任务同时开始时只检测一次，其余任务等待检测结果
+    with _hw_encoder_lock:
+        if _hw_encoder is None:
+            detected = False
+            try:
+                result = subprocess.run([FFMPEG, '-hide_banner', '-encoders'],
+                                        capture_output=True, text=True, timeout=10, **SUBPROCESS_FLAGS)
+                for encoder, options in HW_ENCODERS:
+                    if encoder not in result.stdout:
+                        continue
+                    # 编码器编译进了FFmpeg不代表机器上有对应硬件，用测试画面试编码确认
+                    test = subprocess.run(
+                        [FFMPEG, '-hide_banner', '-f', 'lavfi', '-i', 'color=size=256x256:duration=0.1',
+                         '-c:v', encoder, '-f', 'null', '-'],
+                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30, **SUBPROCESS_FLAGS
+                    )
+                    if test.returncode == 0:
+                        detected = (encoder, options)
+                        break
+            except Exception:
+                pass
+            _hw_encoder = detected
+    return _hw_encoder or None
+
+
+def add_subtitle_to_video(video_path, srt_path, output_path):
+    """将字幕烧录到视频中（优先使用硬件编码器，失败时退回软件编码）"""
+    # 确保使用绝对路径
+    srt_path_abs = os.path.abspath(srt_path)
+
+    # 路径转义：冒号转义，Windows下反斜杠转为正斜杠（见 SUBTITLE_PATH_ESCAPE）
+    srt_path_escaped = srt_path_abs.translate(SUBTITLE_PATH_ESCAPE)
+    if sys.platform.startswith('win'):
+        # 使用 filename= 参数来明确指定文件路径
+        filter_str = f"subtitles=filename='{srt_path_escaped}'"
+    else:
+        filter_str = f"subtitles='{srt_path_escaped}'"
+
+    # 字幕渲染（libass）和编码都按CPU核数开线程
+    threads = str(os.cpu_count() or 4)
+
+    def build_cmd(video_args, decode_args=()):
+        return ([FFMPEG, *FFMPEG_QUIET, *decode_args, '-filter_threads', threads, '-i', video_path, '-vf', filter_str]
+                + video_args + ['-threads', '0', '-c:a', 'copy', *FASTSTART, output_path, '-y'])
+
+    hw_encoder = detect_hw_encoder()
+    if hw_encoder:
+        encoder, options = hw_encoder
+        result = subprocess.run(build_cmd(['-c:v', encoder] + options, HW_DECODE),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, **SUBPROCESS_FLAGS)
+        if result.returncode != 0:
+            # 例如显卡编码会话数已满，退回软件编码
+            print(f"  ⚠ 硬件编码器 {encoder} 编码失败，改用软件编码(libx264)")
+    if not hw_encoder or result.returncode != 0:
+        result = subprocess.run(build_cmd(SOFTWARE_ENCODER),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, **SUBPROCESS_FLAGS)
+    if result.returncode != 0:
+        raise Exception(f"FFmpeg烧录字幕失败: {result.stderr.decode(errors='replace')}")
+
+
+# 可以直接复制到MP4容器的编码（mjpeg/png为封面图）；其他编码（如WMV、VP8、WMA）封装前需要重新编码
+MP4_COPY_VIDEO_CODECS = {'h264', 'hevc', 'av1', 'mjpeg', 'png'}
+MP4_COPY_AUDIO_CODECS = {'aac', 'mp3', 'ac3', 'eac3', 'alac'}
+
+
+def probe_stream_codecs(video_path):
+    """
+    用ffprobe读取视频中视频流和音频流的编码名称
+
+    Returns:
+        (视频编码集合, 音频编码集合)，读取失败时返回None
+    """
+    # 每个流输出一行：codec_name=h264|codec_type=video
+    cmd = [FFPROBE, '-v', 'error', '-show_entries', 'stream=codec_type,codec_name',
+           '-of', 'compact=p=0', video_path]
+    result = subprocess.run(cmd, capture_output=True, text=True, **SUBPROCESS_FLAGS)
+    if result.returncode != 0:
+        return None
+
+    codecs = {'video': set(), 'audio': set()}
+    for line in result.stdout.splitlines():
+        stream = dict(item.split('=', 1) for item in line.strip().split('|') if '=' in item)
+        if stream.get('codec_type') in codecs:
+            codecs[stream['codec_type']].add(stream.get('codec_name', ''))
+    return codecs['video'], codecs['audio']
+
+
+def mux_subtitle_to_video(video_path, srt_path, output_path, language='zh'):
+    """
+    将字幕作为独立字幕轨封装到视频中（软字幕）
+    MP4支持的音视频流直接复制不重新编码，耗时与视频分辨率无关；
+    MP4不支持的编码（如WMV、FLV、WebM中的部分编码）只重新编码这一路流
+
+    Args:
+        video_path: 输入视频路径
+        srt_path: SRT字幕文件路径
+        output_path: 输出视频路径（MP4）
+        language: 字幕语言（zh/en），写入字幕轨元数据
+    """
+    video_args, audio_args = ['-c:v', 'copy'], ['-c:a', 'copy']
+    codecs = probe_stream_codecs(video_path)
+    if codecs is not None:
+        video_codecs, audio_codecs = codecs
+        if not video_codecs <= MP4_COPY_VIDEO_CODECS:
+            print(f"  ⚠ 视频编码 {', '.join(sorted(video_codecs))} 不能直接封装到MP4，重新编码视频")
+            video_args = SOFTWARE_ENCODER
+        if not audio_codecs <= MP4_COPY_AUDIO_CODECS:
+            print(f"  ⚠ 音频编码 {', '.join(sorted(audio_codecs))} 不能直接封装到MP4，重新编码为AAC")
+            audio_args = ['-c:a', 'aac', '-b:a', '192k']
+
+    cmd = [
+        FFMPEG, *FFMPEG_QUIET, '-i', video_path, '-i', srt_path,
+        '-map', '0:v', '-map', '0:a?', '-map', '1:0',
+        *video_args, *audio_args,
+        '-c:s', 'mov_text',  # MP4容器的文本字幕格式
+        '-metadata:s:s:0', f"language={'eng' if language == 'en' else 'chi'}",
+        *FASTSTART, output_path, '-y'
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, **SUBPROCESS_FLAGS)
+    if result.returncode != 0:
+        raise Exception(f"FFmpeg封装字幕失败: {result.stderr.decode(errors='replace')}")
@@ -6,12 +6,12 @@
 """
 
 import os
+import re
 import sys
 import json
-import time
-import subprocess
-import tempfile
-import socket
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import gradio as gr
 from dotenv import load_dotenv
@@ -20,7 +20,7 @@ from openai import OpenAI
 load_dotenv()
 
 try:
-    from aliyun_transcription import AliyunTranscription
+    from aliyun_transcription import AliyunTranscription, json_loads
 except ImportError as e:
     print("=" * 60)
     print("❌ 错误: 缺少必要的依赖库")
@@ -30,47 +30,77 @@ except ImportError as e:
     print("=" * 60)
     sys.exit(1)
 
+import result_cache
+import ffmpeg_utils
 
-def get_audio_duration(audio_path):
-    """获取音频文件时长（秒）"""
-    try:
-        cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-               '-of', 'default=noprint_wrappers=1:nokey=1', audio_path]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-        if result.returncode == 0:
-            return float(result.stdout.strip())
-    except Exception:
-        pass
-    return None
 
+# 已创建的阿里云客户端（按配置复用，保持AcsClient/OSS的HTTP连接池，避免每次处理都重新握手）
+_TRANSCRIPTION_CLIENTS = {}
 
-def extract_audio(video_path, audio_path):
-    """从视频中提取音频为MP3格式（高质量设置）"""
-    cmd = [
-        'ffmpeg', '-i', video_path,
-        '-vn', '-acodec', 'libmp3lame',
-        '-ar', '16000',  # 阿里云要求8000-48000Hz，16000是语音识别的标准采样率
-        '-ac', '1',      # 单声道（语音识别推荐）
-        '-b:a', '128k',  # 提高比特率到128k，保留更多音频细节
-        '-q:a', '2',     # MP3质量等级（0-9，2为高质量）
-        audio_path, '-y'
-    ]
-    result = subprocess.run(cmd, capture_output=True)
-    if result.returncode != 0:
-        raise Exception(f"FFmpeg提取音频失败: {result.stderr.decode()}")
 
+def get_transcription_client(access_key_id, access_key_secret, app_key, bucket_name, region, language):
+    """获取（或创建）阿里云语音识别客户端，相同配置只创建一次"""
+    key = (access_key_id, access_key_secret, app_key, bucket_name, region, language)
+    transcription = _TRANSCRIPTION_CLIENTS.get(key)
+    if transcription is None:
+        transcription = AliyunTranscription(
+            access_key_id=access_key_id,
+            access_key_secret=access_key_secret,
+            app_key=app_key,
+            bucket_name=bucket_name,
+            region=region,
+            language=language
+        )
+        _TRANSCRIPTION_CLIENTS[key] = transcription
+    return transcription
 
 
+def save_audio_info(audio_path, file_hash, duration):
+    """
+    在音频旁保存说明文件（{音频文件名}.json）：来源视频指纹、时长和音频文件的大小/修改时间
+    同名的其他视频不会误用这份音频；管道输出的FLAC文件头中没有时长，也从这里读取
+
+    Args:
+        audio_path: 音频文件路径
+        file_hash: 来源视频的指纹
+        duration: 音频时长（秒）
+    """
+    try:
+        stat = os.stat(audio_path)
+        info = {'file_hash': file_hash, 'duration': duration,
+                'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        with open(audio_path + '.json', 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+    except OSError as e:
+        print(f"  ⚠ 音频说明文件保存失败: {str(e)}")
+
+
+def load_audio_info(audio_path, file_hash):
+    """
+    读取音频说明文件，确认本地音频是从同一视频完整提取的
+
+    Returns:
+        说明信息（dict），没有说明文件、来源视频不同或音频已被改写时返回None
+    """
+    try:
+        with open(audio_path + '.json', 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        stat = os.stat(audio_path)
+    except (OSError, ValueError):
+        return None
+    if (info.get('file_hash') != file_hash or info.get('size') != stat.st_size
+            or info.get('mtime_ns') != stat.st_mtime_ns):
+        return None
+    return info
+
 
 def parse_result_to_srt(result_json, srt_path):
     """将阿里云识别结果转换为SRT字幕格式"""
     # 解析JSON结果（兼容不同的数据类型）
     if isinstance(result_json, dict):
         result = result_json
-    elif isinstance(result_json, str):
-        result = json.loads(result_json)
-    elif isinstance(result_json, bytes):
-        result = json.loads(result_json.decode('utf-8'))
+    elif isinstance(result_json, (str, bytes)):
+        result = json_loads(result_json)
     else:
         raise TypeError(f"不支持的结果类型: {type(result_json)}")
 
@@ -79,128 +109,170 @@ def parse_result_to_srt(result_json, srt_path):
     if not sentences:
         raise Exception("识别结果为空，可能音频没有语音内容")
 
+    # 一次性拼接整个SRT内容后写入，避免每条字幕多次调用write（时间戳单位为毫秒）
+    srt_text = "".join([
+        f"{i}\n{format_timestamp(s['BeginTime'])} --> {format_timestamp(s['EndTime'])}\n{s['Text']}\n\n"
+        for i, s in enumerate(sentences, 1)
+    ])
+
     with open(srt_path, 'w', encoding='utf-8') as f:
-        for i, sentence in enumerate(sentences, 1):
-            # 获取时间戳（单位：毫秒）
-            begin_time = sentence['BeginTime'] / 1000  # 转换为秒
-            end_time = sentence['EndTime'] / 1000
-            text = sentence['Text']
+        f.write(srt_text)
 
-            # 格式化时间戳
-            start = format_timestamp(begin_time)
-            end = format_timestamp(end_time)
 
-            # 写入SRT格式
-            f.write(f"{i}\n")
-            f.write(f"{start} --> {end}\n")
-            f.write(f"{text}\n\n")
+# SRT时间戳格式（预先取出format方法，每条字幕调用两次，不必每次重新解析格式）
+_format_srt_time = "{:02d}:{:02d}:{:02d},{:03d}".format
 
 
-def format_timestamp(seconds):
-    """格式化时间戳为SRT格式"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int((seconds % 1) * 1000)
-    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+def format_timestamp(milliseconds):
+    """格式化时间戳为SRT格式（输入为毫秒，全程整数运算，避免浮点取余的舍入误差）"""
+    secs, millis = divmod(round(milliseconds), 1000)
+    minutes, secs = divmod(secs, 60)
+    hours, minutes = divmod(minutes, 60)
+    return _format_srt_time(hours, minutes, secs, millis)
 
 
-def translate_srt_with_deepseek(input_srt_path, output_srt_path, deepseek_api_key, deepseek_base_url="https://api.deepseek.com"):
+# 每次请求翻译的字幕条数：多条字幕编号后合并为一次请求，减少请求次数和等待时间
+TRANSLATE_BATCH_SIZE = 30
+
+TRANSLATE_SYSTEM_PROMPT = (
+    "You are a professional translator. Translate each numbered English subtitle to Chinese. "
+    "Return only the translations as a numbered list with the same numbers, one per line, no explanations."
+)
+
+# 翻译使用的模型（翻译缓存按模型区分）
+TRANSLATE_MODEL = "deepseek-chat"
+
+# 同时进行的翻译请求数（受DeepSeek并发限制，过大会触发限流）
+TRANSLATE_WORKERS = 4
+
+# SRT字幕块：序号、时间轴、文本（文本可以多行，到空行或文件末尾结束）
+SRT_BLOCK_RE = re.compile(r'^(\d+)\n(\S+ --> \S+)\n(.*?)(?=\n\n|\n*\Z)', re.DOTALL | re.MULTILINE)
+
+# 译文中的编号行，如 "12. 你好"
+NUMBERED_LINE_RE = re.compile(r'^\s*(\d+)\s*[.．、)]\s*(.*)$')
+
+
+def translate_text(client, text):
+    """翻译单条字幕（批量翻译结果对不上编号时使用）"""
+    response = client.chat.completions.create(
+        model=TRANSLATE_MODEL,
+        messages=[
+            {"role": "system", "content": "You are a professional translator. Translate the following English subtitle to Chinese. Only return the translated text, no explanations."},
+            {"role": "user", "content": text}
+        ],
+        temperature=0.3
+    )
+    return response.choices[0].message.content.strip()
+
+
+def translate_batch(client, texts):
     """
-    使用DeepSeek API翻译SRT字幕文件（英文→中文）
+    一次请求翻译多条字幕
 
     Args:
-        input_srt_path: 输入的英文SRT文件路径
-        output_srt_path: 输出的中文SRT文件路径
-        deepseek_api_key: DeepSeek API密钥
-        deepseek_base_url: DeepSeek API基础URL
+        client: DeepSeek（OpenAI兼容）客户端
+        texts: 英文字幕文本列表
+
+    Returns:
+        与texts一一对应的中文译文列表（返回的编号不完整时退回逐条翻译）
     """
-    # 读取英文字幕
-    with open(input_srt_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+    numbered = "\n".join(f"{i}. {' '.join(text.splitlines())}" for i, text in enumerate(texts, 1))
+    response = client.chat.completions.create(
+        model=TRANSLATE_MODEL,
+        messages=[
+            {"role": "system", "content": TRANSLATE_SYSTEM_PROMPT},
+            {"role": "user", "content": numbered}
+        ],
+        temperature=0.3
+    )
 
-    # 解析SRT文件
-    subtitle_blocks = content.strip().split('\n\n')
-    translated_blocks = []
+    translations = {}
+    for line in response.choices[0].message.content.splitlines():
+        match = NUMBERED_LINE_RE.match(line)
+        if match:
+            translations[int(match.group(1))] = match.group(2).strip()
 
-    # 初始化DeepSeek客户端
-    client = OpenAI(
-        api_key=deepseek_api_key,
-        base_url=deepseek_base_url
-    )
+    if all(translations.get(i) for i in range(1, len(texts) + 1)):
+        return [translations[i] for i in range(1, len(texts) + 1)]
+    print(f"⚠ 批量翻译结果与原文条数不一致，改为逐条翻译（{len(texts)} 条）")
+    return [translate_text(client, text) for text in texts]
 
-    for block in subtitle_blocks:
-        lines = block.split('\n')
-        if len(lines) >= 3:
-            index = lines[0]
-            timestamp = lines[1]
-            text = '\n'.join(lines[2:])  # 支持多行字幕
-
-            # 调用DeepSeek翻译
-            try:
-                response = client.chat.completions.create(
-                    model="deepseek-chat",
-                    messages=[
-                        {"role": "system", "content": "You are a professional translator. Translate the following English subtitle to Chinese. Only return the translated text, no explanations."},
-                        {"role": "user", "content": text}
-                    ],
-                    temperature=0.3
-                )
-                translated_text = response.choices[0].message.content.strip()
 
-                # 重建字幕块
-                translated_block = f"{index}\n{timestamp}\n{translated_text}"
-                translated_blocks.append(translated_block)
+# 已创建的DeepSeek客户端（按密钥复用，保持SDK内部的HTTP连接池，多次翻译不重新进行TLS握手）
+_DEEPSEEK_CLIENTS = {}
 
-                # 避免API限流
-                time.sleep(0.2)
 
-            except Exception as e:
-                # 如果翻译失败，保留原文
-                print(f"翻译失败，保留原文: {e}")
-                translated_blocks.append(block)
+def get_deepseek_client(api_key, base_url):
+    """获取（或创建）DeepSeek客户端，相同密钥只创建一次（限流时SDK会自动退避重试）"""
+    key = (api_key, base_url)
+    client = _DEEPSEEK_CLIENTS.get(key)
+    if client is None:
+        client = OpenAI(api_key=api_key, base_url=base_url, max_retries=5)
+        _DEEPSEEK_CLIENTS[key] = client
+    return client
 
-    # 写入翻译后的字幕
-    with open(output_srt_path, 'w', encoding='utf-8') as f:
-        f.write('\n\n'.join(translated_blocks))
+
+def split_api_keys(value):
+    """把逗号分隔的多个API密钥拆分为列表（忽略空白项）"""
+    return [key.strip() for key in (value or "").split(',') if key.strip()]
 
 
-def add_subtitle_to_video(video_path, srt_path, output_path):
+def translate_srt_with_deepseek(input_srt_path, output_srt_path, deepseek_api_key, deepseek_base_url="https://api.deepseek.com"):
     """
-    将字幕烧录到视频中
+    使用DeepSeek API翻译SRT字幕文件（英文→中文）
+    每 TRANSLATE_BATCH_SIZE 条字幕合并为一次请求，每个密钥最多 TRANSLATE_WORKERS 个请求同时进行；
+    提供多个密钥时各批次轮流使用不同密钥；已翻译过的字幕行从本地缓存读取
 
-    使用简化的方法：直接使用绝对路径，让FFmpeg自己处理路径
-    在Windows上，FFmpeg能够正确处理标准路径格式
+    Args:
+        input_srt_path: 输入的英文SRT文件路径
+        output_srt_path: 输出的中文SRT文件路径
+        deepseek_api_key: DeepSeek API密钥（多个密钥用英文逗号分隔）
+        deepseek_base_url: DeepSeek API基础URL
     """
-    # 确保使用绝对路径
-    srt_path_abs = os.path.abspath(srt_path)
-
-    # Windows路径转义：需要转义反斜杠和冒号
-    if sys.platform.startswith('win'):
-        # Windows: 先将反斜杠转为正斜杠，然后转义冒号
-        # 使用 filename= 参数来明确指定文件路径
-        srt_path_escaped = srt_path_abs.replace('\\', '/').replace(':', r'\:')
-        filter_str = f"subtitles=filename='{srt_path_escaped}'"
-    else:
-        # Unix: 转义冒号
-        srt_path_escaped = srt_path_abs.replace(':', r'\:')
-        filter_str = f"subtitles='{srt_path_escaped}'"
+    # 读取英文字幕
+    with open(input_srt_path, 'r', encoding='utf-8') as f:
+        content = f.read()
 
-    cmd = [
-        'ffmpeg', '-i', video_path,
-        '-vf', filter_str,
-        '-c:a', 'copy',
-        output_path, '-y'
-    ]
+    # 解析SRT文件：(序号, 时间轴, 文本)，一次正则扫描完成
+    subtitles = SRT_BLOCK_RE.findall(content)
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise Exception(f"FFmpeg烧录字幕失败: {result.stderr}")
+    # 每个密钥的并发和限流单独计算，多个密钥可以成倍提高翻译速度
+    clients = [get_deepseek_client(key, deepseek_base_url) for key in split_api_keys(deepseek_api_key)]
+    if not clients:
+        raise Exception("未提供有效的DeepSeek API Key")
 
+    def translate_or_none(texts, client):
+        try:
+            return translate_batch(client, texts)
+        except Exception as e:
+            print(f"翻译失败，保留原文: {e}")
+            return None
+
+    # 已翻译过的字幕行直接使用缓存；相同的字幕行只翻译一次
+    texts = [text for _, _, text in subtitles]
+    translations = result_cache.load_translations(texts, TRANSLATE_MODEL)
+    pending = [text for text in dict.fromkeys(texts) if text and text not in translations]
+
+    # 未缓存的字幕分批并行翻译，批次轮流分配给各个密钥
+    batches = [pending[i:i + TRANSLATE_BATCH_SIZE] for i in range(0, len(pending), TRANSLATE_BATCH_SIZE)]
+    new_translations = {}
+    with ThreadPoolExecutor(max_workers=TRANSLATE_WORKERS * len(clients)) as pool:
+        for batch, results in zip(batches, pool.map(translate_or_none, batches, itertools.cycle(clients))):
+            if results is not None:
+                new_translations.update(zip(batch, results))
+    result_cache.save_translations(new_translations, TRANSLATE_MODEL)
+    translations.update(new_translations)
+
+    # 按原顺序重建字幕块（翻译失败的保留原文）
+    translated_blocks = [f"{index}\n{timestamp}\n{translations.get(text, text)}"
+                         for index, timestamp, text in subtitles]
 
+    # 写入翻译后的字幕
+    with open(output_srt_path, 'w', encoding='utf-8') as f:
+        f.write('\n\n'.join(translated_blocks))
 
 
-def process_video(video_path, access_key_id, access_key_secret, app_key, bucket_name, region, language, deepseek_api_key=None, progress=gr.Progress()):
+def process_video(video_path, access_key_id, access_key_secret, app_key, bucket_name, region, language, deepseek_api_key=None, backend="aliyun", subtitle_mode="soft", progress=gr.Progress()):
     """
     处理视频的主函数
 
@@ -213,6 +285,8 @@ def process_video(video_path, access_key_id, access_key_secret, app_key, bucket_
         region: 地域
         language: 识别语言（zh=中文, en=英语）
         deepseek_api_key: DeepSeek API密钥（用于翻译英文字幕）
+        backend: 识别引擎（aliyun=阿里云, whisper=本地Whisper）
+        subtitle_mode: 字幕方式（soft=封装字幕轨，不重新编码；burn=烧录硬字幕）
         progress: Gradio进度条
 
     Returns:
@@ -222,19 +296,19 @@ def process_video(video_path, access_key_id, access_key_secret, app_key, bucket_
     """
     try:
         # 验证输入
-        if not video_path or not os.path.exists(video_path):
+        if not video_path or not os.path.isfile(video_path):
             return None, None, "❌ 错误：请提供有效的视频文件路径"
 
-        if not access_key_id or not access_key_secret or not app_key or not bucket_name:
+        if backend == "aliyun" and (not access_key_id or not access_key_secret or not app_key or not bucket_name):
             return None, None, "❌ 错误：请填写完整的阿里云配置信息"
 
         # 设置输出路径 - 修改：音频和字幕保存到视频同级目录
-        video_dir = Path(video_path).parent
-        base_name = Path(video_path).stem
-        temp_dir = tempfile.mkdtemp()
+        video_path_obj = Path(video_path)
+        video_dir = video_path_obj.parent
+        base_name = video_path_obj.stem
 
-        # MP3保存到视频同级目录
-        audio_path = os.path.join(video_dir, f"{base_name}_audio.mp3")
+        # 音频保存到视频同级目录
+        audio_path = os.path.join(video_dir, f"{base_name}_audio.flac")
 
         # 字幕和输出视频保存到视频同级目录
         lang_suffix = "en" if language == "en" else "zh"
@@ -242,42 +316,92 @@ def process_video(video_path, access_key_id, access_key_secret, app_key, bucket_
         srt_path_zh = os.path.join(video_dir, f"{base_name}_zh.srt")  # 中文字幕
         output_path = os.path.join(video_dir, f"{base_name}_字幕版.mp4")
 
-        # 创建阿里云语音识别客户端
         lang_name = "英语 (English)" if language == "en" else "中文 (Chinese)"
-        progress(0.05, desc=f"[0/5] 初始化阿里云客户端（{lang_name}）...")
-        transcription = AliyunTranscription(
-            access_key_id=access_key_id,
-            access_key_secret=access_key_secret,
-            app_key=app_key,
-            bucket_name=bucket_name,
-            region=region,
-            language=language
-        )
 
-        # 步骤1: 生成固定的OSS对象名称并检查
-        progress(0.1, desc="[1/5] 检查云端是否已有音频...")
-        object_name = transcription.get_audio_object_name(video_path)
-
-        # 步骤2: 检查OSS是否已存在，避免重复提取和上传
-        audio_duration = None
-        if transcription.bucket.object_exists(object_name):
-            progress(0.2, desc="✓ 音频已存在，跳过提取和上传")
-            file_url = transcription.bucket.sign_url('GET', object_name, 3600)
-        else:
-            # 提取音频
-            progress(0.15, desc="[2/5] 提取音频...")
-            extract_audio(video_path, audio_path)
-            audio_duration = get_audio_duration(audio_path)
+        # 同一视频已有识别结果时直接使用，跳过提取、上传和识别
+        progress(0.02, desc="检查识别结果缓存...")
+        file_hash = result_cache.get_file_hash(video_path)
+        model_name = os.getenv("WHISPER_MODEL", "base") if backend == "whisper" else None
+        cache_key = result_cache.cache_key(file_hash, backend, language, model_name)
+        result_json = result_cache.load_result(cache_key)
+        from_cache = result_json is not None
+
+        if from_cache:
+            progress(0.7, desc="✓ 已有识别结果，跳过识别")
+        elif backend == "whisper":
+            # 本地识别：无需上传OSS和轮询云端任务
+            from whisper_transcription import WhisperTranscription, load_audio, SAMPLE_RATE
+
+            transcription = WhisperTranscription(
+                model_name=os.getenv("WHISPER_MODEL", "base"),
+                language=language
+            )
+
+            if transcription.use_whisper_cpp:
+                # whisper.cpp命令行需要读取音频文件
+                progress(0.1, desc="[2/5] 提取音频...")
+                ffmpeg_utils.extract_audio(video_path, audio_path)
+                audio = audio_path
+                audio_duration = ffmpeg_utils.get_audio_duration(audio_path)
+                save_audio_info(audio_path, file_hash, audio_duration)
+            else:
+                # 解码后的PCM直接读入内存，不写临时音频文件
+                progress(0.1, desc="[2/5] 解码音频...")
+                audio = load_audio(video_path)
+                audio_duration = len(audio) / SAMPLE_RATE
 
-            # 上传到OSS
-            progress(0.2, desc="[3/5] 上传音频到OSS...")
-            transcription.bucket.put_object_from_file(object_name, audio_path)
-            file_url = transcription.bucket.sign_url('GET', object_name, 3600)
+            progress(0.2, desc=f"[3/5] 加载Whisper模型（{lang_name}）...")
+            transcription.load_model()
 
-        # 步骤4: 提交识别任务并等待完成
-        progress(0.3, desc="[4/5] 提交识别任务...")
-        result_json = transcription.transcribe_file(file_url, audio_duration)
-        progress(0.7, desc="✓ 识别完成！")
+            progress(0.3, desc="[4/5] 本地语音识别...")
+            result_json = transcription.transcribe_file(audio, audio_duration)
+            progress(0.7, desc="✓ 识别完成！")
+        else:
+            # 创建阿里云语音识别客户端
+            progress(0.05, desc=f"[0/5] 初始化阿里云客户端（{lang_name}）...")
+            transcription = get_transcription_client(
+                access_key_id, access_key_secret, app_key, bucket_name, region, language
+            )
+
+            # 其他机器已识别过同一视频时，直接读取保存在OSS上的结果
+            progress(0.08, desc="[1/5] 检查云端是否已有识别结果...")
+            result_json = transcription.load_transcript(cache_key)
+
+            if result_json is not None:
+                progress(0.7, desc="✓ 云端已有识别结果，跳过识别")
+            else:
+                # 步骤1: 生成固定的OSS对象名称并检查
+                progress(0.1, desc="[1/5] 检查云端是否已有音频...")
+                object_name = transcription.get_audio_object_name(video_path, file_hash)
+
+                # 步骤2: 检查OSS是否已存在，避免重复提取和上传
+                audio_info = load_audio_info(audio_path, file_hash)
+                if transcription.bucket.object_exists(object_name):
+                    progress(0.2, desc="✓ 音频已存在，跳过提取和上传")
+                    # 获取时长（用于动态设置超时），直接读取视频文件信息
+                    audio_duration = ffmpeg_utils.get_audio_duration(video_path)
+                    file_url = transcription.bucket.sign_url('GET', object_name, 3600)
+                elif audio_info is not None:
+                    # 之前已从同一视频提取过完整音频，直接上传，不再重新提取
+                    progress(0.15, desc="[3/5] 本地已有音频，上传到OSS...")
+                    transcription.upload_file(audio_path, object_name)
+                    audio_duration = audio_info.get('duration') or ffmpeg_utils.get_audio_duration(video_path)
+                    file_url = transcription.bucket.sign_url('GET', object_name, 3600)
+                else:
+                    # 提取音频并同时上传到OSS，音频同时保存到视频同级目录
+                    progress(0.15, desc="[2/5] 提取音频并上传到OSS...")
+                    audio_duration = ffmpeg_utils.stream_audio_to_oss(transcription, video_path, object_name, audio_path)
+                    save_audio_info(audio_path, file_hash, audio_duration)
+                    file_url = transcription.bucket.sign_url('GET', object_name, 3600)
+
+                # 步骤4: 提交识别任务并等待完成
+                progress(0.3, desc="[4/5] 提交识别任务...")
+                result_json = transcription.transcribe_file(file_url, audio_duration)
+                transcription.save_transcript(cache_key, result_json)
+                progress(0.7, desc="✓ 识别完成！")
+
+        if not from_cache:
+            result_cache.save_result(cache_key, result_json)
 
         # 步骤5: 生成SRT字幕文件
         progress(0.7, desc="[5/7] 生成字幕文件...")
@@ -286,7 +410,7 @@ def process_video(video_path, access_key_id, access_key_secret, app_key, bucket_
             parse_result_to_srt(result_json, srt_path_en)
 
             # 步骤6: 翻译英文字幕为中文（如果提供了DeepSeek API Key）
-            if deepseek_api_key:
+            if split_api_keys(deepseek_api_key):
                 progress(0.75, desc="[6/7] 使用DeepSeek翻译字幕（英文→中文）...")
                 translate_srt_with_deepseek(srt_path_en, srt_path_zh, deepseek_api_key)
                 final_srt = srt_path_zh
@@ -300,21 +424,72 @@ def process_video(video_path, access_key_id, access_key_secret, app_key, bucket_
             parse_result_to_srt(result_json, srt_path_zh)
             final_srt = srt_path_zh
 
-        # 步骤7: 将字幕烧录到视频
-        progress(0.9, desc="[7/7] 将字幕烧录到视频...")
-        add_subtitle_to_video(video_path, final_srt, output_path)
+        if subtitle_mode == "burn":
+            # 步骤7: 将字幕烧录到视频
+            progress(0.9, desc="[7/7] 将字幕烧录到视频...")
+            ffmpeg_utils.add_subtitle_to_video(video_path, final_srt, output_path)
+        else:
+            # 步骤7: 封装字幕轨（MP4支持的音视频直接复制，几秒内完成）
+            progress(0.9, desc="[7/7] 封装字幕轨...")
+            subtitle_language = "zh" if final_srt == srt_path_zh else "en"
+            ffmpeg_utils.mux_subtitle_to_video(video_path, final_srt, output_path, subtitle_language)
 
-        # 保留音频文件（不再删除MP3）
+        # 保留音频文件（不删除）
 
         progress(1.0, desc="✓ 完成！")
 
         # 返回输出视频和最终使用的字幕文件
-        return output_path, final_srt, "✓ 处理完成！视频和字幕文件已生成。MP3文件已保存到视频同级目录。"
+        return output_path, final_srt, "✓ 处理完成！视频和字幕文件已生成。音频文件已保存到视频同级目录。"
 
     except Exception as e:
         return None, None, f"❌ 处理失败：{str(e)}"
 
 
+# 批量处理时同时处理的视频数（阿里云识别等待云端结果时不占本机资源，烧录字幕时每个任务都会占满CPU）；
+# 本地Whisper识别本身就占满CPU/GPU，逐个处理
+BATCH_WORKERS = 3
+
+
+def process_videos(video_paths, access_key_id, access_key_secret, app_key, bucket_name, region, language, deepseek_api_key=None, backend="aliyun", subtitle_mode="soft", progress=gr.Progress()):
+    """
+    处理一个或多个视频（每行一个路径）
+    多个视频并行处理：各自的上传、识别任务和轮询互不等待，总耗时接近最慢的一个
+    （本地Whisper识别时逐个处理）
+
+    Returns:
+        output_videos: 带字幕的视频路径列表
+        srt_files: 字幕文件路径列表
+        status_message: 每个视频的处理状态
+    """
+    paths = [line.strip().strip('"') for line in (video_paths or "").splitlines() if line.strip()]
+    args = (access_key_id, access_key_secret, app_key, bucket_name, region, language,
+            deepseek_api_key, backend, subtitle_mode)
+
+    if len(paths) <= 1:
+        output_path, srt_path, status = process_video(paths[0] if paths else None, *args, progress=progress)
+        return [output_path] if output_path else [], [srt_path] if srt_path else [], status
+
+    progress(0, desc=f"批量处理 {len(paths)} 个视频...")
+    # 多个任务共用一个进度条会互相覆盖，批量处理时只显示完成数量
+    def no_progress(*args, **kwargs):
+        pass
+
+    output_videos, srt_files, messages = [], [], []
+    workers = 1 if backend == "whisper" else min(len(paths), BATCH_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_video, path, *args, progress=no_progress) for path in paths]
+        for i, (path, future) in enumerate(zip(paths, futures), 1):
+            output_path, srt_path, status = future.result()
+            if output_path:
+                output_videos.append(output_path)
+            if srt_path:
+                srt_files.append(srt_path)
+            messages.append(f"{Path(path).name}: {status}")
+            progress(i / len(paths), desc=f"已完成 {i}/{len(paths)}")
+
+    return output_videos, srt_files, "\n".join(messages)
+
+
 # 创建Gradio界面
 def create_interface():
     # 加载配置文件
@@ -356,7 +531,8 @@ def create_interface():
                     label="视频文件路径",
                     value=default_config.get("video_path"),
                     placeholder=r"例如: C:\Users\YourName\Videos\video.mp4",
-                    info="输入完整的视频文件路径"
+                    info="输入完整的视频文件路径；批量处理时每行一个",
+                    lines=2
                 )
 
                 language_input = gr.Radio(
@@ -366,6 +542,20 @@ def create_interface():
                     info="选择视频中的音频语言"
                 )
 
+                backend_input = gr.Radio(
+                    label="识别引擎",
+                    choices=[("阿里云（推荐）", "aliyun"), ("本地Whisper（无需OSS）", "whisper")],
+                    value="aliyun",
+                    info="本地识别需要安装faster-whisper，无需填写阿里云配置"
+                )
+
+                subtitle_mode_input = gr.Radio(
+                    label="字幕方式",
+                    choices=[("软字幕（字幕轨，几秒完成）", "soft"), ("烧录硬字幕（重新编码）", "burn")],
+                    value="soft",
+                    info="软字幕可在播放器中开关；烧录字幕在任何播放器中都会显示，但需要重新编码视频"
+                )
+
                 gr.Markdown("### 🔑 阿里云配置")
 
                 access_key_id_input = gr.Textbox(
@@ -408,7 +598,7 @@ def create_interface():
                     value=os.getenv("DEEPSEEK_API_KEY", ""),
                     placeholder="您的DeepSeek API密钥（仅英语视频需要）",
                     type="password",
-                    info="可选：用于将英文字幕翻译成中文"
+                    info="可选：用于将英文字幕翻译成中文；多个密钥用英文逗号分隔，可加快翻译"
                 )
 
                 process_btn = gr.Button("🚀 开始处理", variant="primary", size="lg")
@@ -424,17 +614,19 @@ def create_interface():
 
                 video_output = gr.File(
                     label="带字幕的视频文件",
+                    file_count="multiple",
                     interactive=False
                 )
 
                 srt_output = gr.File(
                     label="字幕文件（SRT格式）",
+                    file_count="multiple",
                     interactive=False
                 )
 
         # 绑定处理函数
         process_btn.click(
-            fn=process_video,
+            fn=process_videos,
             inputs=[
                 video_input,
                 access_key_id_input,
@@ -443,7 +635,9 @@ def create_interface():
                 bucket_name_input,
                 region_input,
                 language_input,
-                deepseek_api_key_input
+                deepseek_api_key_input,
+                backend_input,
+                subtitle_mode_input
             ],
             outputs=[video_output, srt_output, status_output]
         )
@@ -456,6 +650,9 @@ if __name__ == "__main__":
     print("视频中文字幕工具 - 使用阿里云语音识别服务")
     print("=" * 60)
 
+    # 后台预先检测硬件编码器（同时把FFmpeg程序载入系统缓存），第一次烧录字幕时不用再等待检测
+    threading.Thread(target=ffmpeg_utils.detect_hw_encoder, daemon=True).start()
+
     demo = create_interface()
     demo.launch(
         server_name="0.0.0.0",  # 允许外部访问
@@ -0,0 +1,214 @@
+# -*- coding: utf8 -*-
+"""
+识别结果本地缓存
+同一视频（按文件内容哈希）、同一识别引擎和语言只识别一次，
+重复处理（例如调整字幕样式后重新生成）时直接读取缓存，跳过提取、上传和识别
+字幕译文按原文缓存在SQLite中，相同的字幕行只翻译一次
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import tempfile
+from pathlib import Path
+
+try:
+    # orjson解析/生成大段JSON（长音频的识别结果）比标准库快数倍，未安装时使用标准库
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj):
+        """与orjson.dumps一致：返回UTF-8编码的bytes，中文不转义"""
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+# 缓存目录（可通过环境变量 SUBTITLE_CACHE_DIR 修改）
+CACHE_DIR = Path(os.getenv("SUBTITLE_CACHE_DIR", Path.home() / ".cache" / "subtitles"))
+
+# 缓存总大小上限（MB），超过时删除最久未使用的结果
+CACHE_MAX_MB = int(os.getenv("SUBTITLE_CACHE_MAX_MB", "200"))
+
+
+def get_file_hash(file_path):
+    """
+    计算文件指纹：文件大小 + 开头、中间、结尾各1MB内容的MD5
+    只用于识别同一个文件（缓存键、OSS对象名），不需要读取整个文件，大视频也只需几毫秒
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        指纹（十六进制字符串）
+    """
+    start_time = time.time()
+    file_size = os.path.getsize(file_path)
+    print(f"  正在计算文件指纹... (文件大小: {file_size / 1024 / 1024:.2f} MB)")
+
+    sample_size = 1024 * 1024
+    hasher = hashlib.md5(str(file_size).encode())
+    with open(file_path, 'rb') as f:
+        if file_size <= sample_size * 3:
+            # 小文件直接读取全部内容
+            hasher.update(f.read())
+        else:
+            for offset in (0, file_size // 2, file_size - sample_size):
+                f.seek(offset)
+                hasher.update(f.read(sample_size))
+
+    elapsed = time.time() - start_time
+    print(f"  ✓ 指纹计算完成，耗时: {elapsed:.3f}秒")
+    return hasher.hexdigest()
+
+
+def cache_key(file_hash, backend, language, model_name=None):
+    """
+    生成缓存键：视频哈希 + 识别引擎 + 语言（本地识别还包括模型）
+
+    Returns:
+        缓存文件名（不含扩展名）
+    """
+    parts = [file_hash, backend, language]
+    if model_name:
+        parts.append(Path(model_name).name)
+    return "_".join(parts)
+
+
+def load_result(key):
+    """
+    读取缓存的识别结果
+
+    Returns:
+        识别结果（dict），没有缓存时返回None
+    """
+    cache_path = CACHE_DIR / f"{key}.json"
+    if not cache_path.is_file():
+        return None
+    try:
+        with open(cache_path, 'rb') as f:
+            result = json_loads(f.read())
+        # 更新修改时间，淘汰缓存时按最近使用时间排序
+        os.utime(cache_path)
+        return result
+    except (OSError, ValueError):
+        # 缓存文件损坏时当作没有缓存
+        return None
+
+
+def save_result(key, result):
+    """
+    保存识别结果到缓存（保存失败不影响主流程）
+
+    Args:
+        key: 缓存键
+        result: 识别结果（dict或JSON字符串）
+    """
+    if isinstance(result, (str, bytes)):
+        result = json_loads(result)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再替换，进程中断或并发写入时不会留下不完整的缓存
+        # （临时文件名由mkstemp生成，同一进程的多个线程同时写同一结果也不会冲突）
+        fd, temp_path = tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp", dir=CACHE_DIR)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(json_dumps(result))
+            os.replace(temp_path, CACHE_DIR / f"{key}.json")
+        except OSError:
+            os.remove(temp_path)
+            raise
+        evict()
+    except OSError as e:
+        print(f"  ⚠ 识别结果缓存保存失败: {str(e)}")
+
+
+def evict(max_mb=CACHE_MAX_MB):
+    """
+    缓存总大小超过上限时，按最近使用时间删除最旧的结果
+
+    Args:
+        max_mb: 缓存总大小上限（MB）
+    """
+    entries = []
+    for path in CACHE_DIR.glob("*.json"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_mb * 1024 * 1024:
+            break
+        try:
+            path.unlink()
+            total_size -= size
+        except OSError:
+            pass
+
+
+def _open_translation_db():
+    """打开（必要时创建）字幕翻译缓存数据库"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(CACHE_DIR / "translations.db"), timeout=10)
+    conn.execute("CREATE TABLE IF NOT EXISTS translations "
+                 "(hash TEXT NOT NULL, model TEXT NOT NULL, dst TEXT NOT NULL, PRIMARY KEY (hash, model))")
+    return conn
+
+
+def _text_hash(text):
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+def load_translations(texts, model):
+    """
+    读取已缓存的字幕译文
+
+    Args:
+        texts: 原文列表
+        model: 翻译模型名称（不同模型的译文分开缓存）
+
+    Returns:
+        {原文: 译文}，只包含有缓存的原文
+    """
+    try:
+        conn = _open_translation_db()
+        try:
+            cached = {}
+            for text in set(texts):
+                row = conn.execute("SELECT dst FROM translations WHERE hash = ? AND model = ?",
+                                   (_text_hash(text), model)).fetchone()
+                if row:
+                    cached[text] = row[0]
+            return cached
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"  ⚠ 读取翻译缓存失败: {str(e)}")
+        return {}
+
+
+def save_translations(translations, model):
+    """
+    保存字幕译文到缓存（保存失败不影响主流程）
+
+    Args:
+        translations: {原文: 译文}
+        model: 翻译模型名称
+    """
+    if not translations:
+        return
+    try:
+        conn = _open_translation_db()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO translations (hash, model, dst) VALUES (?, ?, ?)",
+                                 [(_text_hash(src), model, dst) for src, dst in translations.items()])
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"  ⚠ 保存翻译缓存失败: {str(e)}")
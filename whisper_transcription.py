@@ -0,0 +1,239 @@
+# -*- coding: utf8 -*-
+"""
+本地语音识别工具类（faster-whisper / CTranslate2，或 whisper.cpp 命令行）
+无需上传OSS和轮询云端任务，识别结果结构与阿里云保持一致
+https://github.com/SYSTRAN/faster-whisper
+https://github.com/ggml-org/whisper.cpp
+"""
+import os
+import json
+import time
+import threading
+import subprocess
+import tempfile
+from pathlib import Path
+import numpy as np
+
+from ffmpeg_utils import FFMPEG, FFMPEG_QUIET, SUBPROCESS_FLAGS
+
+try:
+    import ctranslate2
+    from faster_whisper import WhisperModel
+    from huggingface_hub.utils import LocalEntryNotFoundError
+except ImportError:
+    # 只使用whisper.cpp模型（.bin/.gguf）时不需要faster-whisper
+    ctranslate2 = None
+    WhisperModel = None
+
+
+# 已加载的模型（进程内复用，避免每次识别都重新加载）
+_MODEL_CACHE = {}
+# 多个线程同时识别时，同一模型只加载一次（避免重复占用内存/显存）
+_MODEL_LOCK = threading.Lock()
+
+# 模型下载目录（可选，默认使用HuggingFace缓存目录）
+MODEL_DIR = os.getenv("WHISPER_MODEL_DIR")
+
+# Whisper模型要求的采样率
+SAMPLE_RATE = 16000
+
+# whisper.cpp 模型文件扩展名及命令行程序
+WHISPER_CPP_EXTENSIONS = ('.bin', '.gguf')
+WHISPER_CPP_BIN = os.getenv("WHISPER_CPP_BIN", "whisper-cli")
+
+
+def load_audio(media_path, sample_rate=SAMPLE_RATE):
+    """
+    用FFmpeg将音视频文件解码为单声道float32波形
+    PCM数据通过管道直接读入内存，不写临时音频文件
+
+    Args:
+        media_path: 视频或音频文件路径
+        sample_rate: 采样率（默认16000）
+
+    Returns:
+        audio: numpy float32数组，取值范围[-1, 1]
+    """
+    cmd = [
+        FFMPEG, *FFMPEG_QUIET, '-i', media_path,
+        '-vn', '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ac', '1', '-ar', str(sample_rate),
+        '-'
+    ]
+    result = subprocess.run(cmd, capture_output=True, **SUBPROCESS_FLAGS)
+    if result.returncode != 0:
+        raise Exception(f"FFmpeg解码音频失败: {result.stderr.decode(errors='replace')}")
+    return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+def select_device():
+    """
+    选择运行设备和计算精度
+    有CUDA时使用GPU float16；较老的显卡（计算能力低于7.0）不支持高效float16，改用int8量化，
+    都不支持时使用CPU int8量化
+    可通过环境变量 WHISPER_COMPUTE_TYPE 覆盖计算精度（如 int8_float16）
+
+    Returns:
+        (device, compute_type)
+    """
+    if WhisperModel is None:
+        raise Exception("本地识别需要安装faster-whisper，运行: pip install faster-whisper")
+
+    device, compute_type = "cpu", "int8"
+    if ctranslate2.get_cuda_device_count() > 0:
+        cuda_compute_types = ctranslate2.get_supported_compute_types("cuda")
+        if "float16" in cuda_compute_types:
+            device, compute_type = "cuda", "float16"
+        elif "int8_float32" in cuda_compute_types:
+            device, compute_type = "cuda", "int8_float32"
+    return device, os.getenv("WHISPER_COMPUTE_TYPE", compute_type)
+
+
+def get_model(model_name, device="auto", compute_type="int8"):
+    """
+    获取Whisper模型，同一参数只加载一次
+
+    Args:
+        model_name: 模型名称（如 base、small）或本地模型目录
+        device: 运行设备（auto/cpu/cuda）
+        compute_type: 计算精度（int8为CPU量化推理）
+
+    Returns:
+        model: WhisperModel实例
+    """
+    if WhisperModel is None:
+        raise Exception("本地识别需要安装faster-whisper，运行: pip install faster-whisper")
+
+    key = (model_name, device, compute_type)
+    with _MODEL_LOCK:
+        model = _MODEL_CACHE.get(key)
+        if model is None:
+            start_time = time.time()
+            print(f"  正在加载Whisper模型: {model_name} (设备: {device}, 精度: {compute_type})")
+            try:
+                # 优先加载本地已下载的模型，跳过每次启动时对模型仓库的联网检查
+                model = WhisperModel(model_name, device=device, compute_type=compute_type,
+                                     download_root=MODEL_DIR, local_files_only=True)
+            except LocalEntryNotFoundError:
+                # 首次使用：下载模型（之后的运行都直接读取本地文件）；
+                # 其他加载错误（显存不足、驱动问题等）直接抛出，不当作模型未下载
+                print("  本地未找到模型，开始下载...")
+                model = WhisperModel(model_name, device=device, compute_type=compute_type,
+                                     download_root=MODEL_DIR)
+            _MODEL_CACHE[key] = model
+            elapsed = time.time() - start_time
+            print(f"  ✓ 模型加载完成，耗时: {elapsed:.2f}秒")
+    return model
+
+
+class WhisperTranscription:
+    """本地Whisper语音识别封装"""
+
+    def __init__(self, model_name="base", language="zh"):
+        """
+        初始化本地语音识别
+
+        Args:
+            model_name: 模型名称或本地模型目录（默认: base）；
+                        .bin/.gguf 文件使用 whisper.cpp 识别
+            language: 识别语言（zh=中文, en=英语，默认: zh）
+        """
+        self.model_name = model_name
+        self.language = language
+        self.use_whisper_cpp = Path(model_name).suffix in WHISPER_CPP_EXTENSIONS
+        if not self.use_whisper_cpp:
+            self.device, self.compute_type = select_device()
+
+    def load_model(self):
+        """加载（或复用已加载的）Whisper模型；whisper.cpp由命令行自行加载"""
+        if self.use_whisper_cpp:
+            return None
+        return get_model(self.model_name, self.device, self.compute_type)
+
+    def transcribe_with_whisper_cpp(self, audio_path):
+        """
+        使用whisper.cpp命令行识别（纯C++推理，适合无GPU的机器）
+
+        Args:
+            audio_path: 本地音频文件路径
+
+        Returns:
+            result: 识别结果（包含Sentences列表，时间单位为毫秒）
+        """
+        start_time = time.time()
+        print(f"  开始whisper.cpp识别... (时间: {time.strftime('%H:%M:%S')})")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_base = os.path.join(temp_dir, "result")
+            cmd = [
+                WHISPER_CPP_BIN,
+                '-m', self.model_name,
+                '-l', self.language,
+                '-oj',               # 输出JSON（带毫秒时间偏移）
+                '-of', output_base,
+                '-f', audio_path
+            ]
+            # 识别结果写入JSON文件，标准输出（逐句打印的文本）直接丢弃，只保留stderr用于报错
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, **SUBPROCESS_FLAGS)
+            if result.returncode != 0:
+                raise Exception(f"whisper.cpp识别失败: {result.stderr.decode(errors='replace')}")
+
+            with open(output_base + '.json', 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+        sentences = []
+        for item in data.get('transcription', []):
+            sentences.append({
+                'BeginTime': item['offsets']['from'],
+                'EndTime': item['offsets']['to'],
+                'Text': item['text'].strip(),
+            })
+
+        elapsed = time.time() - start_time
+        print(f"  ✓ whisper.cpp识别完成，共 {len(sentences)} 条，耗时: {elapsed:.2f}秒")
+        return {'Sentences': sentences}
+
+    def transcribe_file(self, audio_path, audio_duration=None):
+        """
+        完整的文件转录流程
+
+        Args:
+            audio_path: 本地音频文件路径，或 load_audio() 返回的波形数组（whisper.cpp只支持文件）
+            audio_duration: 音频时长（秒），仅用于显示进度
+
+        Returns:
+            result: 识别结果（与阿里云结果相同，包含Sentences列表，时间单位为毫秒）
+        """
+        if self.use_whisper_cpp:
+            return self.transcribe_with_whisper_cpp(audio_path)
+
+        model = self.load_model()
+
+        start_time = time.time()
+        print(f"  开始本地识别... (时间: {time.strftime('%H:%M:%S')})")
+        # beam_size=1 使用贪心解码；vad_filter 跳过静音片段
+        # condition_on_previous_text=False 不携带上文，缩短解码长度并避免长音频重复输出
+        # temperature=0 只解码一次，不因置信度低而用更高温度反复重新解码
+        segments, _ = model.transcribe(
+            audio_path,
+            language=self.language,
+            vad_filter=True,
+            beam_size=1,
+            temperature=0.0,
+            condition_on_previous_text=False
+        )
+
+        sentences = []
+        for segment in segments:
+            sentences.append({
+                'BeginTime': int(segment.start * 1000),
+                'EndTime': int(segment.end * 1000),
+                'Text': segment.text.strip(),
+            })
+            if audio_duration:
+                progress = min(segment.end / audio_duration * 100, 100)
+                print(f"    识别进度: {progress:.1f}%", end='\r')
+
+        elapsed = time.time() - start_time
+        print(f"\n  ✓ 本地识别完成，共 {len(sentences)} 条，耗时: {elapsed:.2f}秒")
+        return {'Sentences': sentences}